@@ -3,13 +3,11 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import pathlib
 import sys
 
-import qasync
-from PySide2.QtWidgets import QApplication
-
 import config
-import gui
+import startup
 import state
 from classes import *
 
@@ -28,34 +26,82 @@ def handle_exception(loop, context):
 		logger.error(context['message'])
 
 
-def run_default():
+PROFILE_FLAG = '--profile'
+
+
+def profile_arguments():
 	"""
-	Run ChattyBoi with the default configuration, loading settings from the config module,
-	using qasync for the main async event loop, getting a profile from the launcher,
-	and with all available GUI elements enabled.
+	:return: paths passed after each `PROFILE_FLAG` on the command line
 	"""
-	app = QApplication(sys.argv)
-	app.setApplicationName(config.QT_APP_NAME)
-	app.setOrganizationName(config.QT_ORG_NAME)
-	loop = qasync.QEventLoop(app)
-	loop.set_exception_handler(handle_exception)
-	asyncio.set_event_loop(loop)
-	
-	def profile_select_callback(path):
+	return [pathlib.Path(path) for flag, path in zip(sys.argv, sys.argv[1:]) if flag == PROFILE_FLAG]
+
+
+def start_profile(path) -> ApplicationState:
+	"""
+	Load the profile at the given path into a new ApplicationState with its own database, extensions and main window,
+	and start it. Any number of profiles can be started on the same event loop; the first one becomes `state.state`.
+	"""
+	import gui
+	with startup.phase('profile load'):
 		profile = Profile(path)
-		_state = state.state = ApplicationState(logger, profile)
+		# Additional profiles log through a child logger, so that their records can be told apart
+		profile_logger = logger.getChild(profile.name.replace('.', '_')) if state.states else logger
+		_state = ApplicationState(profile_logger, profile)
+		state.state = state.state or _state
+	with startup.phase('database open'):
 		profile.initialize()
-		_state.cleanup.connect(profile.cleanup)
+		_state.attach_database()
+	with startup.phase('extensions'):
 		_state.extension_helper.load_all()
+	with startup.phase('window build'):
 		_state.main_window = gui.MainWindow(_state)
-		_state.ready.emit()
-		_state.main_window.show()
+	_state.bus.publish(EventBus.READY)
+	_state.main_window.show()
+	return _state
+
+
+def run_default():
+	"""
+	Run ChattyBoi with the default configuration, loading settings from the config module,
+	using qasync for the main async event loop, getting a profile from the launcher,
+	and with all available GUI elements enabled.
+	If profiles are given on the command line with `PROFILE_FLAG`, the launcher is skipped and all of them are run
+	in this process, each in its own window.
+	Startup phases are recorded with the `startup` module. Once the application quits, every profile's state is shut
+	down with `ApplicationState.shutdown()`.
+	"""
+	with startup.phase('QApplication'):
+		import qasync
+		from PySide2.QtWidgets import QApplication
+		app = QApplication(sys.argv)
+		app.setApplicationName(config.QT_APP_NAME)
+		app.setOrganizationName(config.QT_ORG_NAME)
+		loop = qasync.QEventLoop(app)
+		loop.set_exception_handler(handle_exception)
+		asyncio.set_event_loop(loop)
 	
-	# TODO: get search paths from QSettings
-	profile_dialog = gui.ProfileSelectDialog(['./profiles'])
-	profile_dialog.accepted.connect(lambda: profile_select_callback(profile_dialog.get_selected_path()))
-	profile_dialog.rejected.connect(QApplication.instance().quit)
-	profile_dialog.show()
+	if paths := profile_arguments():
+		for path in paths:
+			with startup.phase(f'profile "{path}"'):
+				start_profile(path)
+		startup.finish(logger)
+	else:
+		def profile_select_callback(path):
+			startup.mark('profile selected')
+			start_profile(path)
+			startup.finish(logger)
+		
+		with startup.phase('profile dialog'):
+			import gui
+			# TODO: get search paths from QSettings
+			profile_dialog = gui.ProfileSelectDialog(['./profiles'])
+		profile_dialog.accepted.connect(lambda: profile_select_callback(profile_dialog.get_selected_path()))
+		profile_dialog.rejected.connect(QApplication.instance().quit)
+		profile_dialog.show()
 	
 	with loop:
-		return loop.run_forever()
+		code = loop.run_forever()
+		# Cleanup handlers are awaited after Qt's event loop has exited, while the asyncio loop can still run them
+		if state.states:
+			loop.run_until_complete(asyncio.gather(*(_state.shutdown() for _state in state.states)))
+		return code
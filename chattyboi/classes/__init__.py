@@ -1,9 +1,24 @@
 # SPDX-License-Identifier: Apache-2.0
+from .profiling import HandlerStats, ExtensionStats
+from .loop_watchdog import LagHistogram, LoopWatchdog
+from .scheduler import Timer, Scheduler
+from .process_pool import OffloadStats, ProcessPool
+from .log_pipeline import LogPipeline
+from .metrics import Counter, Gauge, Histogram, MetricsRegistry
+from .event_bus import EventBus
 from .extension import Extension
 from .extension_helper import ExtensionHelper
 from .user import User
-from .database_wrapper import DatabaseWrapper
+from .database_wrapper import UserChanges, DatabaseWrapper
+from .user_import import read_rows, ImportProgress, UserImporter
+from .kv_store import KeyValueStore
+from .rate_limit import RateLimiter, TokenBucket, SlidingWindow
+from .nickname_index import NicknameIndex
 from .profile import Profile
+from .profile_archive import export_profile, import_profile
+from .db_maintenance import DatabaseMaintenance
+from .parsed_message import ParsedMessage
 from .message import MessageContent, Message
 from .chat import Chat
+from .chat_registry import ChatRegistry
 from .application_state import ApplicationState
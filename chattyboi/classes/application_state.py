@@ -1,52 +1,157 @@
 # SPDX-License-Identifier: Apache-2.0
 from __future__ import annotations
 
+import asyncio
 import datetime
+import functools
+import itertools
+import json
 import logging
-from typing import List, Optional
+import pathlib
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Type, Union
 
 from PySide2.QtCore import Signal, QObject
-from PySide2.QtWidgets import QApplication
 
-import gui
-import profiles
+import config
+import state as cb_state
 
-from . import Chat, Extension, ExtensionHelper, Message
+from . import (
+	Chat, ChatRegistry, DatabaseMaintenance, EventBus, Extension, ExtensionHelper, KeyValueStore, LogPipeline,
+	LoopWatchdog, Message, MetricsRegistry, NicknameIndex, ProcessPool, Profile, RateLimiter, Scheduler, export_profile
+)
+
+if TYPE_CHECKING:
+	import gui
 
 
 class ApplicationState(QObject):
 	"""
 	Data structure that describes the state of a ChattyBoi application.
 	The following information can be retrieved using this class:
-		* main ChattyBoi logger;
+		* main ChattyBoi logger and its log pipeline;
+		* the event bus;
 		* current profile;
 		* loaded extensions;
 		* associated ExtensionHelper;
-		* associated DatabaseWrapper;
+		* associated DatabaseWrapper, its nickname index and its maintenance service;
 		* active chat streams;
 		* start time and uptime;
+		* per-extension resource usage;
+		* event loop lag and stalls;
+		* the scheduler for periodic jobs;
+		* the process pool for CPU-bound jobs;
+		* the metrics registry;
+		* per-extension key-value stores;
 		* the main GUI window.
+	Events are published on `bus`; the Qt signals below only mirror them for GUI consumers.
+	The state is stopped with `shutdown()`, which ChattyBoi awaits for every state after the Qt event loop exits.
+	Several states can exist in one process, one per profile; every state is added to `state.states` and numbered by
+	`index`, and its event handlers and extensions run with it as the current state (see `state.get()`).
 	"""
 	ready = Signal()
 	cleanup = Signal()
 	chatAdded = Signal(Chat)
+	chatRemoved = Signal(Chat)
 	anyMessageReceived = Signal(Message)
 	anyMessageSent = Signal(str)
+	usersChanged = Signal(object)
+	CLEANUP_TIMEOUT = 10.0
 	
 	def __init__(self, logger, profile, extensions=None, chats=None, main_window=None):
 		super().__init__(None)
-		QApplication.instance().aboutToQuit.connect(self.cleanup)
-		self.profile: profiles.Profile = profile
+		self.profile: Profile = profile
 		self.logger: logging.Logger = logger
+		self.index = len(cb_state.states)
+		cb_state.states.append(self)
+		self.bus = EventBus(logger, {cb_state.current: self})
+		self.log_pipeline = LogPipeline(logger, config.LOG_FORMAT, config.LOG_DATEFMT)
+		if config.LOG_TO_FILE:
+			self.log_pipeline.enable_file_sink(profile.path)
+		self.log_pipeline.start()
 		self.extensions: List[Extension] = extensions or []
-		self.chats: List[Chat] = chats or []
+		self.chats = ChatRegistry(chats or ())
 		self.main_window: Optional[gui.windows.MainWindow] = main_window
 		self.start_time: Optional[datetime.datetime] = None
 		self.extension_helper = ExtensionHelper(self)
-		self.ready.connect(self._on_ready)
+		self.watchdog = LoopWatchdog(self, config.LOOP_STALL_THRESHOLD)
+		self.scheduler = Scheduler(logger)
+		self.process_pool = ProcessPool(config.PROCESS_POOL_SIZE)
+		self.metrics = MetricsRegistry(logger)
+		self._add_builtin_metrics()
+		self.kv_stores: Dict[str, KeyValueStore] = {}
+		# (namespace, name) -> limiter, for limiters shared by name and persisted in their namespace's store
+		self.rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+		self.nickname_index: Optional[NicknameIndex] = None
+		self.db_maintenance = DatabaseMaintenance(self)
+		self.shut_down = False
+		self.bus.subscribe(EventBus.READY, self._on_ready)
+		self._bridge_signals()
+	
+	def _bridge_signals(self):
+		self.bus.subscribe(EventBus.READY, self.ready.emit)
+		self.bus.subscribe(EventBus.CLEANUP, self.cleanup.emit)
+		self.bus.subscribe(EventBus.CHAT_ADDED, self.chatAdded.emit)
+		self.bus.subscribe(EventBus.CHAT_REMOVED, self.chatRemoved.emit)
+		self.bus.subscribe(EventBus.MESSAGE_RECEIVED, self.anyMessageReceived.emit)
+		self.bus.subscribe(EventBus.MESSAGE_SENT, lambda chat, content: self.anyMessageSent.emit(str(content)))
+		self.bus.subscribe(EventBus.USERS_CHANGED, self.usersChanged.emit)
 	
 	def _on_ready(self):
 		self.start_time = datetime.datetime.now()
+		self.watchdog.start()
+		self.scheduler.start()
+		self.db_maintenance.start()
+		if config.METRICS_PORT:
+			# Each profile's metrics are served on their own port
+			asyncio.get_event_loop().create_task(self.metrics.serve(config.METRICS_PORT + self.index))
+	
+	def _add_builtin_metrics(self):
+		self.messages_received = self.metrics.counter(
+			'chattyboi_messages_received_total', 'Messages received', ['chat']
+		)
+		self.messages_sent = self.metrics.counter('chattyboi_messages_sent_total', 'Messages sent', ['chat'])
+		self.db_query_seconds = self.metrics.histogram(
+			'chattyboi_db_query_seconds', 'Duration of user database operations', ['operation']
+		)
+		self.bus.subscribe(
+			EventBus.MESSAGE_RECEIVED, lambda message: self.messages_received.inc(chat=str(message.source))
+		)
+		self.metrics.add_collector(self._collect_metrics)
+	
+	def _collect_metrics(self):
+		handlers = [(ext, h) for ext in self.extensions for h in ext.stats.handlers.values()]
+		yield 'chattyboi_handler_seconds', 'summary', 'Wall time of extension handler calls', [
+			sample
+			for ext, h in handlers
+			for sample in (
+				('chattyboi_handler_seconds_sum', {'extension': ext.name, 'handler': h.name}, h.total_time),
+				('chattyboi_handler_seconds_count', {'extension': ext.name, 'handler': h.name}, h.calls)
+			)
+		]
+		yield 'chattyboi_handler_blocking_seconds_total', 'counter', 'Event loop time held by extension handlers', [
+			('chattyboi_handler_blocking_seconds_total', {'extension': ext.name, 'handler': h.name}, h.blocking_time)
+			for ext, h in handlers
+		]
+		yield 'chattyboi_handler_exceptions_total', 'counter', 'Exceptions raised by extension handlers', [
+			('chattyboi_handler_exceptions_total', {'extension': ext.name, 'handler': h.name}, h.exceptions)
+			for ext, h in handlers
+		]
+		yield 'chattyboi_queue_depth', 'gauge', 'Number of items waiting in internal queues', [
+			('chattyboi_queue_depth', {'queue': 'log'}, self.log_pipeline.queue.qsize()),
+			('chattyboi_queue_depth', {'queue': 'process_pool'}, self.process_pool.queue_depth),
+			('chattyboi_queue_depth', {'queue': 'scheduler'}, sum(timer.queued for timer in self.scheduler.timers))
+		]
+		lag = self.watchdog.histogram
+		cumulative = itertools.accumulate(lag.counts)
+		yield 'chattyboi_loop_lag_seconds', 'histogram', 'Event loop lag', [
+			*(
+				('chattyboi_loop_lag_seconds_bucket', {'le': str(bound)}, count)
+				for bound, count in zip((*lag.BOUNDS, '+Inf'), cumulative)
+			),
+			('chattyboi_loop_lag_seconds_sum', {}, lag.sum),
+			('chattyboi_loop_lag_seconds_count', {}, lag.count)
+		]
 	
 	@property
 	def database(self):
@@ -56,11 +161,124 @@ class ApplicationState(QObject):
 	def uptime(self) -> datetime.timedelta:
 		return datetime.datetime.now() - self.start_time
 	
+	def attach_database(self):
+		"""
+		Publish user changes from the profile's database on the bus, keep `nickname_index` current,
+		and record query durations. Call this after the profile has been initialized.
+		"""
+		self.nickname_index = NicknameIndex(self.database)
+		self.database.change_listeners.append(self.nickname_index.apply)
+		self.database.change_listeners.append(functools.partial(self.bus.publish, EventBus.USERS_CHANGED))
+		self.database.query_observer = lambda operation, seconds: self.db_query_seconds.observe(
+			seconds, operation=operation
+		)
+	
+	def kv_store(self, namespace: str) -> KeyValueStore:
+		"""
+		Get the key-value store for a namespace, usually an extension's hash, creating it on first use.
+		"""
+		if namespace not in self.kv_stores:
+			self.kv_stores[namespace] = KeyValueStore(self.database, namespace, logger=self.logger)
+		return self.kv_stores[namespace]
+	
+	def rate_limiter(
+		self, namespace: str, name: str, limiter_type: Type[RateLimiter], *parameters, persist=False
+	) -> RateLimiter:
+		"""
+		Get the rate limiter registered under a name in a namespace, creating it as `limiter_type(*parameters)` on
+		first use. A persistent limiter is saved to the namespace's key-value store whenever that store flushes after
+		the limiter changed.
+
+		:raise ValueError: if a limiter with that name exists but was created with a different type, parameters or
+			persistence
+		"""
+		key = (namespace, name)
+		limiter = self.rate_limiters.get(key)
+		if limiter is None:
+			limiter = limiter_type(*parameters)
+			if persist:
+				limiter.attach(self.kv_store(namespace), f'rate_limit/{name}')
+			self.rate_limiters[key] = limiter
+		elif (type(limiter), limiter.parameters, limiter.store is not None) != (limiter_type, parameters, persist):
+			raise ValueError(
+				f'Rate limiter "{name}" already exists as {type(limiter).__name__}{limiter.parameters}'
+				f'{" (persistent)" if limiter.store is not None else ""}'
+			)
+		return limiter
+	
+	def flush_kv_stores(self):
+		for store in self.kv_stores.values():
+			store.flush()
+	
 	def find_extension_by_module(self, module) -> Extension:
 		return next(ext for ext in self.extensions if ext.module is module)
 	
+	def profiling_snapshot(self) -> dict:
+		"""
+		Return the resource usage of all loaded extensions, keyed by extension source, along with the snapshot time.
+		"""
+		return {
+			'timestamp': time.time(),
+			'extensions': {ext.source: ext.stats.snapshot() for ext in self.extensions}
+		}
+	
+	def export_profiling_snapshot(self, path: Optional[Union[str, pathlib.Path]] = None) -> pathlib.Path:
+		"""
+		Write `profiling_snapshot()` to a JSON file and return its path.
+		If no path is given, a timestamped file in the profile directory is used.
+		"""
+		snapshot = self.profiling_snapshot()
+		path = pathlib.Path(path or self.profile.path / f'profiling-{int(snapshot["timestamp"])}.json')
+		with path.open('w') as f:
+			json.dump(snapshot, f, indent=2)
+		return path
+	
+	async def export_profile(self, path: Optional[Union[str, pathlib.Path]] = None) -> pathlib.Path:
+		"""
+		Commit the database and write the profile into a compressed archive while it keeps running.
+		The database is streamed into the archive from a worker thread, without blocking the event loop or writers.
+		If no path is given, a timestamped file in the profile directory is used.
+		"""
+		path = pathlib.Path(path or self.profile.path / f'profile-{int(time.time())}.tar.gz')
+		self.database.commit()
+		started = time.perf_counter()
+		await asyncio.get_event_loop().run_in_executor(None, export_profile, self.profile, path)
+		self.logger.info(f'Exported profile "{self.profile.name}" to {path} in {time.perf_counter() - started:.2f}s')
+		return path
+	
+	async def shutdown(self):
+		"""
+		Stop the state in two phases. First, CLEANUP is published, and its async handlers (such as extensions'
+		`on_cleanup` handlers) are awaited for up to `CLEANUP_TIMEOUT` seconds while the database, the stores and
+		logging still work. Then rate limiters and key-value stores are flushed, database maintenance and the other
+		services are stopped, the profile's database is committed and closed, and finally the log pipeline is stopped.
+		Calling this again has no effect.
+		"""
+		if self.shut_down:
+			return
+		self.shut_down = True
+		await self.bus.publish_and_wait(EventBus.CLEANUP, timeout=self.CLEANUP_TIMEOUT)
+		steps = [
+			self.flush_kv_stores, self.db_maintenance.cleanup, self.metrics.stop, self.watchdog.stop,
+			self.scheduler.stop, self.process_pool.shutdown
+		]
+		if self.database is not None:
+			steps.append(self.profile.cleanup)
+		for step in steps:
+			try:
+				step()
+			except Exception:
+				self.logger.exception(f'Exception in cleanup step "{step.__qualname__}"')
+		self.log_pipeline.stop()
+	
 	def add_chat(self, chat):
-		self.chats.append(chat)
-		self.chats.sort(key=lambda c: str(c))
-		chat.messageReceived.connect(self.anyMessageReceived)
-		self.chatAdded.emit(chat)
+		if chat in self.chats:
+			return
+		self.chats.add(chat)
+		chat.state = self
+		self.bus.publish(EventBus.CHAT_ADDED, chat)
+	
+	def remove_chat(self, chat):
+		self.chats.remove(chat)
+		chat.state = None
+		self.bus.publish(EventBus.CHAT_REMOVED, chat)
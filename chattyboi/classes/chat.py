@@ -2,19 +2,21 @@
 from __future__ import annotations
 
 import collections
-from typing import List, Deque, Generic
+from typing import TYPE_CHECKING, List, Deque, Generic, Optional
 
 from PySide2.QtCore import Signal, QObject
 
-import state
+from . import EventBus, MessageContent, Message, User
 
-from . import MessageContent, Message, User
+if TYPE_CHECKING:
+	from . import ApplicationState
 
 
 class Chat(QObject, Generic[MessageContent]):
 	"""
 	Represents an API which can produce Message objects and to which content can be sent.
-	Whenever a new message is received, `new_message()` should be called. Signals are handled automatically.
+	Whenever a new message is received, `new_message()` should be called. It emits `messageReceived` and, once the
+	chat is registered, publishes the message on the event bus of the state it's registered with (`state`).
 	"""
 	messageReceived = Signal(Message)
 	
@@ -22,6 +24,7 @@ class Chat(QObject, Generic[MessageContent]):
 		super().__init__(None)
 		self.messages: Deque[Message[MessageContent]] = collections.deque()
 		self.name = 'Unknown'
+		self.state: Optional[ApplicationState] = None
 	
 	def __str__(self):
 		return self.name
@@ -29,10 +32,14 @@ class Chat(QObject, Generic[MessageContent]):
 	def new_message(self, message: Message[MessageContent]):
 		self.messages.append(message)
 		self.messageReceived.emit(message)
+		if self.state is not None:
+			self.state.bus.publish(EventBus.MESSAGE_RECEIVED, message)
 		return message
 	
 	async def send_to(self, content: MessageContent, users: List[User]):
 		await self.send(''.join(f'@{user.name} ' for user in users) + str(content))
 	
 	async def send(self, content: MessageContent):
-		state.state.anyMessageSent.emit(str(content))
+		if self.state is not None:
+			self.state.messages_sent.inc(chat=str(self))
+			self.state.bus.publish(EventBus.MESSAGE_SENT, self, content)
@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import bisect
+import itertools
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import Chat
+
+
+class ChatRegistry:
+	"""
+	Registered chats, ordered by name (as returned by `str()` at registration) and then by registration order.
+	Chats are found, inserted and removed by binary search over a parallel list of sort keys, instead of re-sorting
+	on every registration, and can be looked up by identity or by name.
+	Every callable in `listeners` is called with an event and a position, in the spirit of Qt's item models:
+	"about_to_insert" and "inserted" around an insertion, "about_to_remove" and "removed" around a removal.
+	"""
+	ABOUT_TO_INSERT = 'about_to_insert'
+	INSERTED = 'inserted'
+	ABOUT_TO_REMOVE = 'about_to_remove'
+	REMOVED = 'removed'
+
+	def __init__(self, chats: Iterable[Chat] = ()):
+		self._keys: List[Tuple[str, int]] = []
+		self._chats: List[Chat] = []
+		self._key_of: Dict[Chat, Tuple[str, int]] = {}
+		self._counter = itertools.count()
+		self.listeners: List[Callable[[str, int], None]] = []
+		for chat in chats:
+			self.add(chat)
+
+	def __len__(self):
+		return len(self._chats)
+
+	def __iter__(self) -> Iterator[Chat]:
+		return iter(self._chats)
+
+	def __getitem__(self, index) -> Chat:
+		return self._chats[index]
+
+	def __contains__(self, chat):
+		return chat in self._key_of
+
+	def _notify(self, event, index):
+		for listener in self.listeners:
+			listener(event, index)
+
+	def index(self, chat: Chat) -> int:
+		"""
+		:raise ValueError: if the chat isn't registered
+		"""
+		if chat not in self._key_of:
+			raise ValueError(f'Chat "{chat}" is not registered')
+		return bisect.bisect_left(self._keys, self._key_of[chat])
+
+	def find(self, name: str) -> Optional[Chat]:
+		"""
+		:return: the first registered chat with the given name, or None
+		"""
+		i = bisect.bisect_left(self._keys, (name,))
+		if i < len(self._keys) and self._keys[i][0] == name:
+			return self._chats[i]
+		return None
+
+	def add(self, chat: Chat) -> int:
+		"""
+		Register a chat and return its position. Registering a chat twice has no effect.
+		"""
+		if chat in self._key_of:
+			return self.index(chat)
+		key = (str(chat), next(self._counter))
+		# Keys are unique, so this is the position after all chats with the same name
+		index = bisect.bisect_left(self._keys, key)
+		self._notify(self.ABOUT_TO_INSERT, index)
+		self._keys.insert(index, key)
+		self._chats.insert(index, chat)
+		self._key_of[chat] = key
+		self._notify(self.INSERTED, index)
+		return index
+
+	def remove(self, chat: Chat) -> int:
+		"""
+		Unregister a chat and return the position it had.
+
+		:raise ValueError: if the chat isn't registered
+		"""
+		index = self.index(chat)
+		self._notify(self.ABOUT_TO_REMOVE, index)
+		del self._keys[index]
+		del self._chats[index]
+		del self._key_of[chat]
+		self._notify(self.REMOVED, index)
+		return index
@@ -1,24 +1,58 @@
 # SPDX-License-Identifier: Apache-2.0
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import dataclasses
 import json
 import pathlib
 import sqlite3
-from typing import Union, Optional
+import time
+from typing import Callable, List, Optional, Set, Union
 
 import chattyboi
 import utils
 
 
+@dataclasses.dataclass
+class UserChanges:
+	"""
+	Rowids of users that were added or whose columns were changed since the last notification.
+	A user that was added is not listed in the other sets, even if it was changed afterwards.
+	"""
+	added: Set[int] = dataclasses.field(default_factory=set)
+	nicknames: Set[int] = dataclasses.field(default_factory=set)
+	created_on: Set[int] = dataclasses.field(default_factory=set)
+	extension_data: Set[int] = dataclasses.field(default_factory=set)
+	
+	@property
+	def changed(self) -> Set[int]:
+		return self.nicknames | self.created_on | self.extension_data
+	
+	def record(self, kind, rowid):
+		if kind == 'added':
+			self.added.add(rowid)
+		elif rowid not in self.added:
+			getattr(self, kind).add(rowid)
+
+
 class DatabaseWrapper(sqlite3.Connection):
 	"""
 	Wrapper around a profile's SQLite3 database that provides ChattyBoi-specific helper functions.
+	Besides `user_info`, the `user_nicknames` table maps every nickname to its user's rowid. It is derived from
+	`user_info.nicknames`, kept current by this class and by `User`, and indexed for exact and prefix lookups.
+	Changes to users made through this class or `User` are collected into a `UserChanges` object, which is passed to
+	every callable in `change_listeners` once per event loop iteration, or immediately where no event loop is running.
+	If `query_observer` is set, it's called with the name and duration in seconds of every operation on users.
 	"""
 	SELF_NICKNAME = 'self'
 	
 	def __init__(self, source: pathlib.Path, *args, **kwargs):
 		super().__init__(source, *args, **kwargs)
 		self.source = source
+		self.change_listeners: List[Callable[[UserChanges], None]] = []
+		self._pending_changes: Optional[UserChanges] = None
+		self.query_observer: Optional[Callable[[str, float], None]] = None
 	
 	def __eq__(self, other):
 		return self.source == other.source
@@ -29,6 +63,70 @@ class DatabaseWrapper(sqlite3.Connection):
 	def self_user(self):
 		return self.find_or_add_user(self.SELF_NICKNAME)
 	
+	@contextlib.contextmanager
+	def timed(self, operation):
+		if self.query_observer is None:
+			yield
+			return
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.query_observer(operation, time.perf_counter() - start)
+	
+	def record_change(self, kind, rowid):
+		"""
+		:param kind: "added", or the name of the user_info column that was changed
+		"""
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			# No loop to batch on, e.g. in scripts and worker threads, so listeners are notified right away
+			loop = None
+		if self._pending_changes is None:
+			self._pending_changes = UserChanges()
+			if loop is not None:
+				loop.call_soon(self.flush_changes)
+		self._pending_changes.record(kind, rowid)
+		if loop is None:
+			self.flush_changes()
+	
+	def flush_changes(self):
+		"""
+		Notify listeners of the changes recorded so far. This is called automatically.
+		"""
+		changes, self._pending_changes = self._pending_changes, None
+		if changes is not None:
+			for listener in self.change_listeners:
+				listener(changes)
+	
+	def build_nickname_index(self):
+		"""
+		Populate `user_nicknames` from `user_info` if it's empty, e.g. for databases created before it existed.
+		"""
+		c = self.cursor()
+		if c.execute('SELECT 1 FROM user_nicknames LIMIT 1').fetchone():
+			return
+		c.executemany(
+			'INSERT INTO user_nicknames (nickname, user_id) VALUES (?, ?)',
+			(
+				(nickname, rowid)
+				for rowid, nicknames in self.cursor().execute('SELECT rowid, nicknames FROM user_info')
+				for nickname in json.loads(nicknames)
+			)
+		)
+	
+	def index_nicknames(self, rowid, nicknames):
+		"""
+		Replace the `user_nicknames` entries of a user.
+		"""
+		c = self.cursor()
+		c.execute('DELETE FROM user_nicknames WHERE user_id = ?', (rowid,))
+		c.executemany(
+			'INSERT INTO user_nicknames (nickname, user_id) VALUES (?, ?)',
+			((nickname, rowid) for nickname in nicknames)
+		)
+	
 	def add_user(self, nicknames, extension_data: Union[str, dict] = None) -> int:
 		"""
 		Add a new user entry to the database and return its row ID if successful.
@@ -37,25 +135,28 @@ class DatabaseWrapper(sqlite3.Connection):
 		for nickname in nicknames:
 			if self.find_user(nickname):
 				raise ValueError(f'A user with the nickname "{nickname}" already exists')
-		self.cursor().execute(
-			'INSERT INTO user_info (nicknames, created_on, extension_data) '
-			'VALUES (?, ?, ?)',
-			(json.dumps(nicknames), utils.utc_timestamp(), json.dumps(extension_data or {}))
-		)
-		return int(self.cursor().execute('SELECT last_insert_rowid()').fetchone()[0])
+		with self.timed('add_user'):
+			c = self.cursor()
+			c.execute(
+				'INSERT INTO user_info (nicknames, created_on, extension_data) '
+				'VALUES (?, ?, ?)',
+				(json.dumps(nicknames), utils.utc_timestamp(), json.dumps(extension_data or {}))
+			)
+			rowid = int(c.lastrowid)
+			self.index_nicknames(rowid, nicknames)
+		self.record_change('added', rowid)
+		return rowid
 	
 	def find_user(self, nickname: str) -> Optional[chattyboi.User]:
 		"""
 		Find and return a User object whose `nicknames` entry in the database matches the given nickname.
 		If no user was found, None will be returned.
 		"""
-		c = self.cursor()
-		c.execute('SELECT rowid FROM user_info WHERE nicknames LIKE ?', (f'%"{nickname}"%',))
-		try:
-			rowid = c.fetchone()[0]
-			return chattyboi.User(self, rowid)
-		except TypeError:
-			return None
+		with self.timed('find_user'):
+			c = self.cursor()
+			c.execute('SELECT user_id FROM user_nicknames WHERE nickname = ? LIMIT 1', (nickname,))
+			row = c.fetchone()
+		return chattyboi.User(self, row[0]) if row else None
 	
 	def find_or_add_user(self, nickname, extension_data: Union[str, dict] = None) -> chattyboi.User:
 		return self.find_user(nickname) or chattyboi.User(self, self.add_user([nickname], extension_data))
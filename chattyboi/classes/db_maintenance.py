@@ -0,0 +1,162 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Optional
+
+from . import EventBus, Scheduler, Timer
+
+if TYPE_CHECKING:
+	from . import ApplicationState
+
+
+def _quick_check(path) -> list:
+	connection = sqlite3.connect(str(path))
+	try:
+		return [row[0] for row in connection.execute('PRAGMA quick_check')]
+	finally:
+		connection.close()
+
+
+class DatabaseMaintenance:
+	"""
+	Keeps a state's user database compact and its query plans current without getting in the way of message handling.
+	Every `CHECK_INTERVAL` seconds, if no message has been received or sent for `IDLE_AFTER` seconds, one round
+	of small steps is run:
+		* an incremental vacuum of up to `VACUUM_PAGES` free pages, if the database uses incremental auto-vacuum;
+		* a passive WAL checkpoint, which never waits for locks, if the database is in WAL mode;
+		* `PRAGMA optimize` with a bounded analysis, every `OPTIMIZE_INTERVAL` seconds;
+		* `PRAGMA quick_check` in a worker thread on a separate connection, every `INTEGRITY_CHECK_INTERVAL` seconds.
+	On cleanup, `PRAGMA optimize` and a truncating checkpoint are run. Databases created without incremental
+	auto-vacuum are converted with a full VACUUM on cleanup once a quarter of their pages are free.
+	Results are logged, and `status_text()` summarizes them.
+	"""
+	IDLE_AFTER = 30.0
+	CHECK_INTERVAL = 60.0
+	VACUUM_PAGES = 256
+	OPTIMIZE_INTERVAL = 3600.0
+	INTEGRITY_CHECK_INTERVAL = 86400.0
+	ANALYSIS_LIMIT = 400
+	CONVERT_FREE_RATIO = 0.25
+
+	def __init__(self, state: ApplicationState):
+		self.state = state
+		self.logger = state.logger
+		self.timer: Optional[Timer] = None
+		self.last_activity = time.monotonic()
+		self.next_optimize = time.monotonic() + self.OPTIMIZE_INTERVAL
+		self.next_integrity_check = time.monotonic()
+		self.reclaimed_bytes = 0
+		self.integrity: Optional[str] = None
+
+	@property
+	def database(self):
+		return self.state.database
+
+	@property
+	def idle(self):
+		return time.monotonic() - self.last_activity >= self.IDLE_AFTER
+
+	def pragma(self, name):
+		return self.database.execute(f'PRAGMA {name}').fetchone()[0]
+
+	def note_activity(self, *args):
+		self.last_activity = time.monotonic()
+
+	def start(self):
+		self.state.bus.subscribe(EventBus.MESSAGE_RECEIVED, self.note_activity)
+		self.state.bus.subscribe(EventBus.MESSAGE_SENT, self.note_activity)
+		self.timer = self.state.scheduler.schedule(
+			self.run, self.CHECK_INTERVAL, Scheduler.FIXED_DELAY, delay=self.CHECK_INTERVAL, name='database maintenance'
+		)
+
+	async def run(self):
+		if not self.idle:
+			return
+		self.incremental_vacuum()
+		self.checkpoint('PASSIVE')
+		if time.monotonic() >= self.next_optimize:
+			await asyncio.sleep(0)
+			self.optimize()
+		if time.monotonic() >= self.next_integrity_check:
+			await self.integrity_check()
+
+	def incremental_vacuum(self):
+		if self.pragma('auto_vacuum') != 2:
+			return
+		free = self.pragma('freelist_count')
+		if not free:
+			return
+		start = time.perf_counter()
+		# Cursors only step this pragma once, freeing a single page, while executescript() runs it to completion.
+		# executescript() also commits, which is needed for the freed pages to be truncated anyway.
+		self.database.executescript(f'PRAGMA incremental_vacuum({self.VACUUM_PAGES})')
+		reclaimed = (free - self.pragma('freelist_count')) * self.pragma('page_size')
+		self.reclaimed_bytes += reclaimed
+		elapsed = time.perf_counter() - start
+		self.logger.info(f'Database maintenance: reclaimed {reclaimed / 1024:.0f} KiB in {elapsed * 1000:.1f} ms')
+
+	def checkpoint(self, mode):
+		if self.pragma('journal_mode') != 'wal':
+			return
+		start = time.perf_counter()
+		busy, frames, checkpointed = self.database.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+		if frames > 0:
+			self.logger.debug(
+				f'Database maintenance: checkpointed {checkpointed} of {frames} WAL frames '
+				f'in {(time.perf_counter() - start) * 1000:.1f} ms'
+			)
+
+	def optimize(self):
+		start = time.perf_counter()
+		self.database.execute(f'PRAGMA analysis_limit = {self.ANALYSIS_LIMIT}').fetchall()
+		self.database.execute('PRAGMA optimize').fetchall()
+		self.next_optimize = time.monotonic() + self.OPTIMIZE_INTERVAL
+		self.logger.info(f'Database maintenance: optimized in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+	async def integrity_check(self):
+		"""
+		Check the committed contents of the database from a worker thread.
+		"""
+		self.next_integrity_check = time.monotonic() + self.INTEGRITY_CHECK_INTERVAL
+		start = time.perf_counter()
+		problems = await asyncio.get_event_loop().run_in_executor(None, _quick_check, self.state.profile.db_path)
+		elapsed = time.perf_counter() - start
+		if problems == ['ok']:
+			self.integrity = 'ok'
+			self.logger.info(f'Database maintenance: integrity check passed in {elapsed:.2f}s')
+		else:
+			self.integrity = f'{len(problems)} problems'
+			self.logger.error(
+				f'Database maintenance: integrity check found {len(problems)} problems in {elapsed:.2f}s:\n'
+				+ '\n'.join(problems[:20])
+			)
+
+	def cleanup(self):
+		if self.timer is not None:
+			self.timer.cancel()
+		if self.database is None:
+			return
+		self.database.commit()
+		self.optimize()
+		pages, free = self.pragma('page_count'), self.pragma('freelist_count')
+		if self.pragma('auto_vacuum') == 0 and pages and free / pages >= self.CONVERT_FREE_RATIO:
+			start = time.perf_counter()
+			self.database.execute('PRAGMA auto_vacuum = INCREMENTAL')
+			self.database.execute('VACUUM')
+			reclaimed = (pages - self.pragma('page_count')) * self.pragma('page_size')
+			self.logger.info(
+				f'Database maintenance: vacuumed and enabled incremental vacuum, reclaiming {reclaimed / 1024:.0f} KiB '
+				f'in {time.perf_counter() - start:.2f}s'
+			)
+		self.checkpoint('TRUNCATE')
+
+	def status_text(self):
+		text = f'Database: {self.pragma("page_count") * self.pragma("page_size") / 1048576:.1f} MiB'
+		if self.reclaimed_bytes:
+			text += f', {self.reclaimed_bytes / 1024:.0f} KiB reclaimed'
+		if self.integrity:
+			text += f', integrity {self.integrity}'
+		return text
@@ -0,0 +1,101 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import inspect
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+class EventBus:
+	"""
+	Dispatches events to subscribers on the asyncio event loop, without going through Qt.
+	Plain callables are called synchronously, in subscription order, when an event is published. Async functions
+	are started as tasks, which the bus keeps referenced until they finish; exceptions from either are logged
+	and don't affect other subscribers.
+	The topics used by ChattyBoi itself are the constants below. Qt signals on ApplicationState mirror them for
+	the GUI; everything else should subscribe here.
+	The context variables in `context` are set to their values while handlers are called, and so are inherited by
+	the tasks of async handlers.
+	`publish_and_wait()` also waits for the tasks it started, which ApplicationState uses to let CLEANUP handlers
+	finish before it closes the database.
+	"""
+	READY = 'ready'
+	CLEANUP = 'cleanup'
+	MESSAGE_RECEIVED = 'message_received'
+	MESSAGE_SENT = 'message_sent'
+	CHAT_ADDED = 'chat_added'
+	CHAT_REMOVED = 'chat_removed'
+	USERS_CHANGED = 'users_changed'
+
+	def __init__(self, logger: Optional[logging.Logger] = None, context: Dict[contextvars.ContextVar, Any] = None):
+		self.logger = logger
+		self.context = context or {}
+		# Subscribers are stored as immutable tuples, so publishing never has to copy them
+		self.subscribers: Dict[str, Tuple[Tuple[Callable, bool], ...]] = {}
+		self.tasks: Set[asyncio.Task] = set()
+
+	def subscribe(self, topic: str, handler: Callable):
+		"""
+		Call the handler with the arguments of every event published on the topic.
+		"""
+		entry = (handler, inspect.iscoroutinefunction(handler))
+		self.subscribers[topic] = self.subscribers.get(topic, ()) + (entry,)
+		return handler
+
+	def unsubscribe(self, topic: str, handler: Callable):
+		self.subscribers[topic] = tuple(entry for entry in self.subscribers.get(topic, ()) if entry[0] != handler)
+
+	def publish(self, topic: str, *args) -> List[asyncio.Task]:
+		"""
+		:return: tasks started for async handlers
+		"""
+		subscribers = self.subscribers.get(topic, ())
+		started = []
+		if not subscribers:
+			return started
+		tokens = [(var, var.set(value)) for var, value in self.context.items()]
+		try:
+			for handler, is_async in subscribers:
+				try:
+					if is_async:
+						task = asyncio.get_event_loop().create_task(handler(*args))
+						self.tasks.add(task)
+						task.add_done_callback(self._task_done)
+						started.append(task)
+					else:
+						handler(*args)
+				except Exception:
+					self._log_exception(topic, handler)
+		finally:
+			for var, token in reversed(tokens):
+				var.reset(token)
+		return started
+
+	async def publish_and_wait(self, topic: str, *args, timeout: Optional[float] = None):
+		"""
+		Publish an event and wait until its async handlers have finished. Handlers still running after `timeout`
+		seconds are cancelled.
+		"""
+		tasks = self.publish(topic, *args)
+		if not tasks:
+			return
+		_, pending = await asyncio.wait(tasks, timeout=timeout)
+		for task in pending:
+			if self.logger:
+				self.logger.warning(
+					f'Cancelling "{topic}" event handler "{task.get_coro().__qualname__}" after {timeout}s'
+				)
+			task.cancel()
+		if pending:
+			await asyncio.wait(pending)
+
+	def _task_done(self, task: asyncio.Task):
+		self.tasks.discard(task)
+		if not task.cancelled() and task.exception() is not None and self.logger:
+			self.logger.error(f'Exception in event handler "{task.get_coro().__qualname__}"', exc_info=task.exception())
+
+	def _log_exception(self, topic, handler):
+		if self.logger:
+			self.logger.exception(f'Exception in "{topic}" event handler "{getattr(handler, "__qualname__", handler)}"')
@@ -1,10 +1,13 @@
 # SPDX-License-Identifier: Apache-2.0
 from __future__ import annotations
 
-import logging
-from typing import List
+import pathlib
+from typing import TYPE_CHECKING, List, Optional
 
-import state
+from . import ExtensionStats
+
+if TYPE_CHECKING:
+	from . import ApplicationState, KeyValueStore
 
 
 class Extension:
@@ -15,6 +18,9 @@ class Extension:
 	All attributes in the module's __all__ can be accessed through this object.
 	If any of them collide with the attributes defined here, the former takes priority,
 	but this behavior is strongly discouraged unless you intend to override the behavior.
+	Exports are resolved once, after the module has been executed (see `bind_exports()`), into read-only properties
+	on a per-extension subclass; reading them always returns the module's current value, while everything else
+	costs a normal attribute lookup.
 	"""
 	name: str
 	source: str
@@ -26,11 +32,14 @@ class Extension:
 	requires: List[str]
 	implements: List[str]
 	
-	def __init__(self, metadata, hash, module):
+	def __init__(self, metadata, hash, module, state: ApplicationState):
 		self.__dict__.update(metadata)
 		self.hash = hash
 		self.module = module
+		self.state = state
 		self._aliases = set()
+		self.stats = ExtensionStats()
+		self._storage_path: Optional[pathlib.Path] = None
 	
 	def __str__(self):
 		return self.name
@@ -39,16 +48,27 @@ class Extension:
 		return self.module is other.module
 	
 	def __hash__(self):
-		return self.hash
+		return hash(self.hash)
+	
+	def bind_exports(self):
+		"""
+		Make the attributes in the module's __all__ accessible through this object.
+		This is called by ExtensionHelper once the module has been executed. Names added to __all__ afterwards
+		are not picked up unless this is called again.
+		"""
+		cls = type(self)
+		base = cls.__bases__[0] if getattr(cls, '__exports__', None) is not None else cls
+		exports = tuple(getattr(self.module, '__all__', ()))
+		if not exports:
+			self.__class__ = base
+			return
+		namespace = {item: self._export_property(item) for item in exports}
+		namespace['__exports__'] = exports
+		self.__class__ = type(base.__name__, (base,), namespace)
 	
-	def __getattribute__(self, item):
-		try:
-			module = super().__getattribute__('module')
-			if item in module.__all__:
-				return getattr(module, item)
-		except AttributeError:
-			pass
-		return super().__getattribute__(item)
+	@staticmethod
+	def _export_property(item):
+		return property(lambda self: getattr(self.module, item), doc=f'Exported module attribute "{item}"')
 	
 	@property
 	def aliases(self):
@@ -59,8 +79,20 @@ class Extension:
 	
 	@property
 	def storage_path(self):
-		path = state.state.profile.extension_storage_path / self.hash
-		if not path.exists():
-			path.mkdir(parents=True)
-			logger.log(logging.INFO, f'Created extension storage directory "{path}" for "{self}"')
+		"""
+		Per-profile directory for the extension's files, created on first access.
+		For small pieces of state, `store` is usually a better fit.
+		"""
+		path = self.state.profile.extension_storage_path / self.hash
+		if path != self._storage_path:
+			path.mkdir(parents=True, exist_ok=True)
+			self.state.logger.debug(f'Using extension storage directory "{path}" for "{self}"')
+			self._storage_path = path
 		return path
+	
+	@property
+	def store(self) -> KeyValueStore:
+		"""
+		The extension's key-value store in the profile's database.
+		"""
+		return self.state.kv_store(self.hash)
@@ -10,6 +10,8 @@ import sys
 import toml
 
 import config
+import startup
+import state as cb_state
 from . import Extension
 
 
@@ -26,6 +28,9 @@ class ExtensionHelper:
 		* creating and loading extension modules;
 		* initializing associated Extension objects;
 		* updating the state's extension list.
+	Modules are executed with the state set as the current one (see `state.use()`). When more than one profile
+	runs in the process, the module names of every state but the first get a suffix, so that each profile has its own
+	copy of the extension's module.
 	"""
 	@dataclasses.dataclass
 	class _UninitializedExtensionInfo:
@@ -59,14 +64,21 @@ class ExtensionHelper:
 		self.state = state
 	
 	def load(self, path, metadata, module_name=None):
+		with startup.phase(f'extension "{metadata["name"]}"'):
+			self._load(path, metadata, module_name)
+	
+	def _load(self, path, metadata, module_name=None):
 		hash = self.get_hash(metadata['source'])
-		module_name = module_name or 'cbext_' + hash
+		module_name = module_name or 'cbext_' + hash + (f'_{self.state.index}' if self.state.index else '')
 		spec = importlib.util.spec_from_file_location(module_name, path / '__init__.py')
 		module = importlib.util.module_from_spec(spec)
 		sys.modules[module_name] = module
-		extension = Extension(metadata, hash, module)
+		extension = Extension(metadata, hash, module, self.state)
 		self.state.extensions.append(extension)
-		spec.loader.exec_module(module)
+		cb_state.extensions[module_name] = extension
+		with cb_state.use(self.state):
+			spec.loader.exec_module(module)
+		extension.bind_exports()
 	
 	def load_all(self):
 		"""
@@ -0,0 +1,177 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import asyncio
+import collections
+import json
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import chattyboi
+
+_MISSING = object()
+_DELETED = object()
+
+
+class KeyValueStore:
+	"""
+	Persistent string-keyed store of JSON-serializable values for one namespace (usually an extension's hash),
+	kept in the `extension_kv` table of the profile's database.
+	Reads go through an LRU cache of up to `cache_size` entries, including keys known to be missing. Writes are kept
+	in memory and written out together in one transaction `flush_delay` seconds after the first of them, or when
+	`flush()` is called; ApplicationState flushes all stores on cleanup.
+	Objects that keep their own state in the store, such as persistent rate limiters, can add a callable to
+	`flush_hooks` to write it with `set()` at the start of every flush, and call `request_flush()` when it changes.
+	Values are encoded when they're set, so values that can't be serialized raise there, and the cache holds them
+	encoded. Every read decodes a new copy, so mutating a value that was read or set doesn't change what's stored
+	until it is passed to `set()`.
+	"""
+	def __init__(
+		self, database: chattyboi.DatabaseWrapper, namespace: str, flush_delay=1.0, cache_size=10000,
+		logger: Optional[logging.Logger] = None
+	):
+		self.database = database
+		self.namespace = namespace
+		self.flush_delay = flush_delay
+		self.cache_size = cache_size
+		self.logger = logger
+		# Both hold JSON strings, or _DELETED
+		self._cache: collections.OrderedDict[str, Any] = collections.OrderedDict()
+		self._dirty: Dict[str, Any] = {}
+		self._flush_handle: Optional[asyncio.TimerHandle] = None
+		self.flush_hooks: List[Callable[[], None]] = []
+
+	def __contains__(self, key: str):
+		return self.get(key, _MISSING) is not _MISSING
+
+	def __getitem__(self, key: str):
+		value = self.get(key, _MISSING)
+		if value is _MISSING:
+			raise KeyError(key)
+		return value
+
+	def __setitem__(self, key: str, value):
+		self.set(key, value)
+
+	def __delitem__(self, key: str):
+		self.delete(key)
+
+	def _remember(self, key, value):
+		self._cache[key] = value
+		self._cache.move_to_end(key)
+		if len(self._cache) > self.cache_size:
+			self._cache.popitem(last=False)
+
+	def get(self, key: str, default=None):
+		if key in self._dirty:
+			value = self._dirty[key]
+		elif key in self._cache:
+			self._cache.move_to_end(key)
+			value = self._cache[key]
+		else:
+			with self.database.timed('kv.get'):
+				c = self.database.cursor()
+				c.execute('SELECT value FROM extension_kv WHERE namespace = ? AND key = ?', (self.namespace, key))
+				row = c.fetchone()
+			value = row[0] if row else _DELETED
+			self._remember(key, value)
+		return default if value is _DELETED else json.loads(value)
+
+	def set(self, key: str, value):
+		"""
+		:raise TypeError: if the value isn't JSON-serializable
+		"""
+		encoded = json.dumps(value)
+		self._dirty[key] = encoded
+		self._remember(key, encoded)
+		self._schedule_flush()
+
+	def delete(self, key: str):
+		self._dirty[key] = _DELETED
+		self._remember(key, _DELETED)
+		self._schedule_flush()
+
+	def request_flush(self):
+		"""
+		Make sure a flush happens within `flush_delay` seconds, even if nothing was set.
+		"""
+		self._schedule_flush()
+
+	def _schedule_flush(self):
+		if self._flush_handle is None:
+			self._flush_handle = asyncio.get_event_loop().call_later(self.flush_delay, self.flush)
+
+	def flush(self):
+		"""
+		Write all pending changes to the database and commit them.
+		"""
+		# Changes made by the hooks are part of this flush, since the scheduled one hasn't been cancelled yet
+		for hook in self.flush_hooks:
+			try:
+				hook()
+			except Exception:
+				if self.logger:
+					self.logger.exception(f'Exception in flush hook of key-value store "{self.namespace}"')
+		if self._flush_handle is not None:
+			self._flush_handle.cancel()
+			self._flush_handle = None
+		if not self._dirty:
+			return
+		dirty, self._dirty = self._dirty, {}
+		with self.database.timed('kv.flush'):
+			c = self.database.cursor()
+			c.executemany(
+				'INSERT OR REPLACE INTO extension_kv (namespace, key, value) VALUES (?, ?, ?)',
+				((self.namespace, key, value) for key, value in dirty.items() if value is not _DELETED)
+			)
+			c.executemany(
+				'DELETE FROM extension_kv WHERE namespace = ? AND key = ?',
+				((self.namespace, key) for key, value in dirty.items() if value is _DELETED)
+			)
+			self.database.commit()
+		if self.logger:
+			self.logger.debug(f'Flushed {len(dirty)} changes to key-value store "{self.namespace}"')
+
+	def range(
+		self, start: Optional[str] = None, end: Optional[str] = None, limit: Optional[int] = None, reverse=False
+	) -> Iterator[Tuple[str, Any]]:
+		"""
+		Iterate over the (key, value) pairs with `start` <= key < `end` in key order, which is the order of the keys'
+		UTF-8 encodings. Pending changes are flushed first.
+		"""
+		self.flush()
+		query = 'SELECT key, value FROM extension_kv WHERE namespace = ?'
+		parameters = [self.namespace]
+		if start is not None:
+			query += ' AND key >= ?'
+			parameters.append(start)
+		if end is not None:
+			query += ' AND key < ?'
+			parameters.append(end)
+		query += ' ORDER BY key DESC' if reverse else ' ORDER BY key'
+		if limit is not None:
+			query += ' LIMIT ?'
+			parameters.append(limit)
+		with self.database.timed('kv.range'):
+			rows = self.database.cursor().execute(query, parameters).fetchall()
+		for key, value in rows:
+			yield key, json.loads(value)
+
+	def scan(self, prefix: str, limit: Optional[int] = None, reverse=False) -> Iterator[Tuple[str, Any]]:
+		"""
+		Iterate over the (key, value) pairs whose keys start with `prefix`, in key order.
+		"""
+		end = prefix + '\U0010ffff' if prefix else None
+		return self.range(prefix or None, end, limit, reverse)
+
+	def clear(self):
+		"""
+		Delete every key in this namespace.
+		"""
+		if self._flush_handle is not None:
+			self._flush_handle.cancel()
+			self._flush_handle = None
+		self._dirty.clear()
+		self._cache.clear()
+		self.database.cursor().execute('DELETE FROM extension_kv WHERE namespace = ?', (self.namespace,))
+		self.database.commit()
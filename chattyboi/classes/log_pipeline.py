@@ -0,0 +1,77 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import logging
+import logging.handlers
+import pathlib
+import queue
+from typing import Optional
+
+
+class LogPipeline:
+	"""
+	Routes a logger's records through a queue, so that logging calls only pay for an enqueue and never block
+	the event loop. A QueueListener thread passes the records on to the sinks: the console, an optional rotating
+	log file, and any sinks added with `add_sink()`. Sinks are called from the listener thread, so consumers that
+	must run on the GUI thread should add a QueueHandler with their own queue and drain it on a timer.
+	While the pipeline isn't running, the logger behaves as if it didn't exist.
+	"""
+	LOG_FILENAME = 'chattyboi.log'
+	LOG_FILE_MAX_BYTES = 1024 * 1024
+	LOG_FILE_BACKUP_COUNT = 3
+
+	def __init__(self, logger: logging.Logger, log_format: str, date_format: str):
+		self.logger = logger
+		self.formatter = logging.Formatter(log_format, date_format)
+		self.queue = queue.SimpleQueue()
+		self.queue_handler = logging.handlers.QueueHandler(self.queue)
+		console = logging.StreamHandler()
+		console.setFormatter(self.formatter)
+		self.listener = logging.handlers.QueueListener(self.queue, console, respect_handler_level=True)
+		self.file_handler: Optional[logging.handlers.RotatingFileHandler] = None
+		self._propagate = logger.propagate
+
+	@property
+	def running(self):
+		return self.queue_handler in self.logger.handlers
+
+	def add_sink(self, handler: logging.Handler):
+		self.listener.handlers = (*self.listener.handlers, handler)
+
+	def remove_sink(self, handler: logging.Handler):
+		self.listener.handlers = tuple(h for h in self.listener.handlers if h is not handler)
+
+	def enable_file_sink(self, directory: pathlib.Path):
+		"""
+		Also write records to a rotating log file in the given directory.
+		"""
+		if self.file_handler is not None:
+			return
+		self.file_handler = logging.handlers.RotatingFileHandler(
+			directory / self.LOG_FILENAME, maxBytes=self.LOG_FILE_MAX_BYTES, backupCount=self.LOG_FILE_BACKUP_COUNT,
+			encoding='utf-8'
+		)
+		self.file_handler.setFormatter(self.formatter)
+		self.add_sink(self.file_handler)
+
+	def start(self):
+		if self.running:
+			return
+		self._propagate = self.logger.propagate
+		self.logger.propagate = False
+		self.logger.addHandler(self.queue_handler)
+		self.listener.start()
+
+	def stop(self):
+		"""
+		Detach from the logger and process all queued records. Records logged afterwards are handled as usual.
+		"""
+		if not self.running:
+			return
+		self.logger.removeHandler(self.queue_handler)
+		self.logger.propagate = self._propagate
+		self.listener.stop()
+		if self.file_handler is not None:
+			self.remove_sink(self.file_handler)
+			self.file_handler.close()
+			self.file_handler = None
@@ -0,0 +1,161 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import List, Optional
+
+
+class LagHistogram:
+	"""
+	Cumulative histogram of event loop lag samples. Bucket bounds are in seconds; the last bucket is unbounded.
+	"""
+	BOUNDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+	def __init__(self):
+		self.counts: List[int] = [0] * (len(self.BOUNDS) + 1)
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	def add(self, value: float):
+		self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+		self.count += 1
+		self.sum += value
+		self.max = max(self.max, value)
+
+	def percentile(self, p: float) -> float:
+		"""
+		Return the upper bound of the bucket containing the p-th percentile (0-100), or the maximum sample
+		if it falls into the unbounded bucket.
+		"""
+		if not self.count:
+			return 0.0
+		rank = p / 100 * self.count
+		seen = 0
+		for bound, count in zip(self.BOUNDS, self.counts):
+			seen += count
+			if seen >= rank:
+				return min(bound, self.max)
+		return self.max
+
+	def snapshot(self) -> dict:
+		return {
+			'bounds': list(self.BOUNDS),
+			'counts': list(self.counts),
+			'count': self.count,
+			'sum': self.sum,
+			'max': self.max
+		}
+
+
+class LoopWatchdog:
+	"""
+	Measures event loop lag and reports stalls.
+	A callback is scheduled on the loop every `interval` seconds; the difference between when it was supposed to run
+	and when it actually ran is recorded in `histogram`. A daemon thread checks the time of the last callback,
+	and if the loop hasn't ticked for longer than `threshold` seconds, it captures the stack of the loop's thread.
+	The stall is logged once the loop is responsive again, along with the extension and code location that were
+	running at the time of the capture, if any.
+	"""
+	EXTENSION_MODULE_PREFIX = 'cbext_'
+
+	def __init__(self, state, threshold=0.25, interval=0.05):
+		self.state = state
+		self.threshold = threshold
+		self.interval = interval
+		self.histogram = LagHistogram()
+		self.stalls = 0
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._loop_thread_id: Optional[int] = None
+		self._handle: Optional[asyncio.TimerHandle] = None
+		self._thread: Optional[threading.Thread] = None
+		self._stop_event = threading.Event()
+		self._heartbeat = 0.0
+		self._expected = 0.0
+		self._reported_heartbeat = None
+
+	@property
+	def running(self):
+		return self._thread is not None
+
+	def start(self):
+		if self.running:
+			return
+		self._loop = asyncio.get_event_loop()
+		self._loop_thread_id = threading.get_ident()
+		self._stop_event.clear()
+		self._heartbeat = self._expected = time.monotonic()
+		self._schedule()
+		self._thread = threading.Thread(target=self._watch, name='ChattyBoi loop watchdog', daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		if not self.running:
+			return
+		self._stop_event.set()
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+		self._thread.join()
+		self._thread = None
+
+	def _schedule(self):
+		self._expected = time.monotonic() + self.interval
+		self._handle = self._loop.call_later(self.interval, self._tick)
+
+	def _tick(self):
+		now = time.monotonic()
+		self.histogram.add(max(0.0, now - self._expected))
+		self._heartbeat = now
+		self._schedule()
+
+	def _watch(self):
+		while not self._stop_event.wait(self.interval):
+			heartbeat = self._heartbeat
+			lag = time.monotonic() - heartbeat
+			if lag > self.threshold and heartbeat != self._reported_heartbeat:
+				self._reported_heartbeat = heartbeat
+				frame = sys._current_frames().get(self._loop_thread_id)
+				if frame is None:
+					continue
+				stack = traceback.extract_stack(frame)
+				extension, location = self._find_culprit(frame)
+				self._loop.call_soon_threadsafe(self._report, heartbeat, stack, extension, location)
+
+	def _find_culprit(self, frame):
+		"""
+		Return the innermost extension and its code location in the frame's stack, or (None, innermost location).
+		"""
+		location = f'{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+		while frame is not None:
+			module_name = frame.f_globals.get('__name__', '')
+			if module_name.startswith(self.EXTENSION_MODULE_PREFIX):
+				root = module_name.split('.', 1)[0]
+				extension = next((ext for ext in self.state.extensions if ext.module.__name__ == root), None)
+				if extension is not None:
+					return extension, f'{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+			frame = frame.f_back
+		return None, location
+
+	def _report(self, heartbeat, stack, extension, location):
+		self.stalls += 1
+		duration = self._heartbeat - heartbeat if self._heartbeat > heartbeat else time.monotonic() - heartbeat
+		self.state.logger.log(
+			logging.WARNING,
+			f'Event loop stalled for {duration * 1000:.0f} ms '
+			f'(caused by {f"extension {extension}" if extension else "core"} at {location})'
+		)
+		self.state.logger.log(logging.DEBUG, 'Stack of the stalled event loop:\n' + ''.join(stack.format()))
+
+	def lag_text(self):
+		return (
+			f'Loop lag: p50 {self.histogram.percentile(50) * 1000:.0f} ms, '
+			f'p99 {self.histogram.percentile(99) * 1000:.0f} ms, '
+			f'max {self.histogram.max * 1000:.0f} ms, {self.stalls} stalls'
+		)
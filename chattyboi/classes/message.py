@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import collections
 import datetime
+import functools
 from typing import Optional, TypeVar, Generic
 
 from PySide2.QtCore import QObject
@@ -16,6 +17,7 @@ class Message(QObject, Generic[MessageContent]):
 	"""
 	Represents a single message.
 	A message with `None` as the source can be useful for debugging if the bot doesn't need to send a response.
+	Handlers that inspect the content should prefer `parsed`, which is computed once and shared by all of them.
 	"""
 	
 	def __init__(self, source: Optional[chattyboi.Chat], author: chattyboi.User, content: MessageContent, timestamp=None):
@@ -28,6 +30,13 @@ class Message(QObject, Generic[MessageContent]):
 	def __str__(self):
 		return str(self.content)
 	
+	@functools.cached_property
+	def parsed(self) -> chattyboi.ParsedMessage:
+		"""
+		Tokens, normalized text, mentions and command of this message; see `ParsedMessage`.
+		"""
+		return chattyboi.ParsedMessage(self)
+	
 	async def respond(self, *args, **kwargs):
 		await self.source.send(*args, **kwargs)
 	
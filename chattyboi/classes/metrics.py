@@ -0,0 +1,201 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import abc
+import asyncio
+import bisect
+import logging
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value) -> str:
+	return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help(value) -> str:
+	return str(value).replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+	if not labels:
+		return ''
+	return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+	if value == math.inf:
+		return '+Inf'
+	if value == -math.inf:
+		return '-Inf'
+	return repr(float(value))
+
+
+class Metric(abc.ABC):
+	"""
+	Base class for metrics. Label values are passed as keyword arguments and must match `labelnames`.
+	"""
+	type = 'untyped'
+
+	def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+		self.name = name
+		self.help = help
+		self.labelnames = tuple(labelnames)
+
+	def _key(self, labels) -> Tuple[str, ...]:
+		if len(labels) != len(self.labelnames):
+			raise ValueError(f'Metric "{self.name}" expects the labels {self.labelnames}, got {tuple(labels)}')
+		return tuple(str(labels[name]) for name in self.labelnames)
+
+	@abc.abstractmethod
+	def samples(self) -> List[Sample]:
+		pass
+
+
+class Counter(Metric):
+	type = 'counter'
+
+	def __init__(self, name, help, labelnames=()):
+		super().__init__(name, help, labelnames)
+		self.values: Dict[Tuple[str, ...], float] = {}
+
+	def inc(self, amount=1.0, **labels):
+		if amount < 0:
+			raise ValueError('Counters can only be incremented by non-negative amounts')
+		key = self._key(labels)
+		self.values[key] = self.values.get(key, 0.0) + amount
+
+	def get(self, **labels) -> float:
+		return self.values.get(self._key(labels), 0.0)
+
+	def samples(self):
+		return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+	type = 'gauge'
+
+	def inc(self, amount=1.0, **labels):
+		key = self._key(labels)
+		self.values[key] = self.values.get(key, 0.0) + amount
+
+	def dec(self, amount=1.0, **labels):
+		self.inc(-amount, **labels)
+
+	def set(self, value, **labels):
+		self.values[self._key(labels)] = float(value)
+
+
+class Histogram(Metric):
+	type = 'histogram'
+	DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+	def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+		super().__init__(name, help, labelnames)
+		self.buckets = tuple(sorted(buckets))
+		# Per label set: non-cumulative bucket counts (the last one is +Inf), sum
+		self.values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+	def observe(self, value, **labels):
+		key = self._key(labels)
+		if key not in self.values:
+			self.values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+		counts, total = self.values[key]
+		counts[bisect.bisect_left(self.buckets, value)] += 1
+		total[0] += value
+
+	def samples(self):
+		samples = []
+		for key, (counts, total) in self.values.items():
+			labels = dict(zip(self.labelnames, key))
+			cumulative = 0
+			for bound, count in zip((*self.buckets, math.inf), counts):
+				cumulative += count
+				samples.append((f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+			samples.append((f'{self.name}_sum', labels, total[0]))
+			samples.append((f'{self.name}_count', labels, cumulative))
+		return samples
+
+
+class MetricsRegistry:
+	"""
+	Collection of metrics that can be rendered in the Prometheus text exposition format.
+	Besides metrics that are updated as things happen, collectors can be added with `add_collector()`: they are called
+	on every render and return (name, type, help, samples) tuples, which is useful for values that are already
+	tracked elsewhere, such as queue sizes.
+	`serve()` starts an HTTP server on the event loop that responds to every request with `render()`.
+	"""
+	CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+	def __init__(self, logger: Optional[logging.Logger] = None):
+		self.logger = logger
+		self.metrics: Dict[str, Metric] = {}
+		self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+		self.server: Optional[asyncio.AbstractServer] = None
+
+	def _register(self, cls, name, help, labelnames, **kwargs):
+		if name in self.metrics:
+			metric = self.metrics[name]
+			if type(metric) is not cls or metric.labelnames != tuple(labelnames):
+				raise ValueError(f'A different metric named "{name}" is already registered')
+			return metric
+		metric = self.metrics[name] = cls(name, help, labelnames, **kwargs)
+		return metric
+
+	def counter(self, name, help, labelnames=()) -> Counter:
+		"""
+		Register a counter, or return the existing one with the same name.
+		"""
+		return self._register(Counter, name, help, labelnames)
+
+	def gauge(self, name, help, labelnames=()) -> Gauge:
+		return self._register(Gauge, name, help, labelnames)
+
+	def histogram(self, name, help, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS) -> Histogram:
+		return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+	def add_collector(self, collector):
+		self.collectors.append(collector)
+
+	def render(self) -> str:
+		families = [(m.name, m.type, m.help, m.samples()) for m in self.metrics.values()]
+		for collector in self.collectors:
+			try:
+				families.extend(collector())
+			except Exception:
+				if self.logger:
+					self.logger.exception('Exception in metrics collector')
+		lines = []
+		for name, type, help, samples in families:
+			lines.append(f'# HELP {name} {_escape_help(help)}')
+			lines.append(f'# TYPE {name} {type}')
+			lines.extend(
+				f'{sample_name}{_format_labels(labels)} {_format_value(value)}' for sample_name, labels, value in samples
+			)
+		return '\n'.join(lines) + '\n'
+
+	async def serve(self, port: int, host='127.0.0.1'):
+		if self.server is None:
+			self.server = await asyncio.start_server(self._handle_request, host, port)
+
+	def stop(self):
+		if self.server is not None:
+			self.server.close()
+			self.server = None
+
+	async def _handle_request(self, reader, writer):
+		try:
+			# Every request gets the metrics, so only the request head needs to be consumed
+			while await reader.readline() not in (b'\r\n', b'\n', b''):
+				pass
+			body = self.render().encode('utf-8')
+			writer.write(
+				b'HTTP/1.0 200 OK\r\n'
+				+ f'Content-Type: {self.CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n\r\n'.encode('ascii')
+				+ body
+			)
+			await writer.drain()
+		finally:
+			writer.close()
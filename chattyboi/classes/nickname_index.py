@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+import chattyboi
+
+
+class NicknameIndex:
+	"""
+	In-memory index of all nicknames for case-insensitive prefix searches, such as @-mention completion.
+	Nicknames are kept casefolded in a sorted list, with a parallel list of (nickname, rowid) entries, so a search is
+	a binary search followed by a scan over the matches.
+	The index is built from `user_nicknames` on first use. Pass `UserChanges` to `apply()` to keep it current: changed
+	users are re-read from the database, unless so many changed that rebuilding on the next search is cheaper.
+	"""
+	# Rebuild instead of updating in place once more than this fraction of the index has changed
+	REBUILD_RATIO = 0.05
+
+	def __init__(self, database: chattyboi.DatabaseWrapper):
+		self.database = database
+		self.keys: List[str] = []
+		self.entries: List[Tuple[str, int]] = []
+		self.by_user: Dict[int, List[str]] = {}
+		self.built = False
+
+	def __len__(self):
+		self.build()
+		return len(self.keys)
+
+	def build(self):
+		if self.built:
+			return
+		with self.database.timed('nickname_index.build'):
+			rows = self.database.cursor().execute('SELECT nickname, user_id FROM user_nicknames').fetchall()
+		entries = sorted((nickname.casefold(), nickname, rowid) for nickname, rowid in rows)
+		self.keys = [key for key, _, _ in entries]
+		self.entries = [(nickname, rowid) for _, nickname, rowid in entries]
+		self.by_user = {}
+		for nickname, rowid in self.entries:
+			self.by_user.setdefault(rowid, []).append(nickname)
+		self.built = True
+
+	def invalidate(self):
+		self.built = False
+
+	def _remove(self, rowid):
+		for nickname in self.by_user.pop(rowid, ()):
+			key = nickname.casefold()
+			i = bisect.bisect_left(self.keys, key)
+			while i < len(self.keys) and self.keys[i] == key:
+				if self.entries[i][1] == rowid:
+					del self.keys[i]
+					del self.entries[i]
+					break
+				i += 1
+
+	def _insert(self, rowid, nicknames):
+		for nickname in nicknames:
+			key = nickname.casefold()
+			i = bisect.bisect_right(self.keys, key)
+			self.keys.insert(i, key)
+			self.entries.insert(i, (nickname, rowid))
+		if nicknames:
+			self.by_user[rowid] = list(nicknames)
+
+	def apply(self, changes: chattyboi.UserChanges):
+		if not self.built:
+			return
+		rowids = changes.added | changes.nicknames
+		if len(rowids) > max(len(self.keys), 1) * self.REBUILD_RATIO:
+			self.invalidate()
+			return
+		c = self.database.cursor()
+		for rowid in rowids:
+			self._remove(rowid)
+			c.execute('SELECT nickname FROM user_nicknames WHERE user_id = ?', (rowid,))
+			self._insert(rowid, [nickname for nickname, in c])
+
+	def search(self, prefix: str, limit: Optional[int] = 10) -> List[Tuple[str, int]]:
+		"""
+		Find users with a nickname that starts with the prefix, ignoring case.
+
+		:param limit: maximum number of users to return, or None for all of them
+		:return: (matching nickname, rowid) pairs in alphabetical order of the nicknames, one per user
+		"""
+		self.build()
+		prefix = prefix.casefold()
+		found: Dict[int, str] = {}
+		i = bisect.bisect_left(self.keys, prefix)
+		while i < len(self.keys) and self.keys[i].startswith(prefix) and (limit is None or len(found) < limit):
+			nickname, rowid = self.entries[i]
+			found.setdefault(rowid, nickname)
+			i += 1
+		return [(nickname, rowid) for rowid, nickname in found.items()]
@@ -0,0 +1,103 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import functools
+import string
+from typing import List, Optional
+
+import chattyboi
+import config
+
+
+class ParsedMessage:
+	"""
+	Commonly needed views of a message's content, each computed on first access and then cached.
+	Get it through `Message.parsed`, so that all handlers of a message share the same instance. The content is read
+	once, when the first property is accessed; changing it afterwards doesn't update the view.
+	A message is a command if its first token starts with `config.COMMAND_PREFIX`, e.g. "!points add alice 5".
+	Mentions are tokens starting with "@", without surrounding punctuation.
+	"""
+	MENTION_PREFIX = '@'
+	_STRIP = string.punctuation.replace('_', '') + '’'
+
+	def __init__(self, message: chattyboi.Message):
+		self.message = message
+
+	@functools.cached_property
+	def text(self) -> str:
+		return str(self.message.content)
+
+	@functools.cached_property
+	def tokens(self) -> List[str]:
+		"""
+		The text split on whitespace.
+		"""
+		return self.text.split()
+
+	@functools.cached_property
+	def normalized(self) -> str:
+		"""
+		The tokens, casefolded and joined with single spaces, for case-insensitive matching.
+		"""
+		return ' '.join(self.tokens).casefold()
+
+	@functools.cached_property
+	def words(self) -> List[str]:
+		"""
+		Casefolded tokens without surrounding punctuation, skipping tokens that consist only of punctuation.
+		"""
+		return [word for word in (token.strip(self._STRIP) for token in self.normalized.split()) if word]
+
+	@functools.cached_property
+	def mentions(self) -> List[str]:
+		"""
+		Mentioned nicknames in order of appearance, without duplicates.
+		"""
+		mentions = []
+		for token in self.tokens:
+			if token.startswith(self.MENTION_PREFIX):
+				nickname = token[len(self.MENTION_PREFIX):].strip(self._STRIP)
+				if nickname and nickname not in mentions:
+					mentions.append(nickname)
+		return mentions
+
+	@functools.cached_property
+	def mentioned_users(self) -> List[chattyboi.User]:
+		"""
+		Users whose nickname was mentioned, in order of appearance. Unknown nicknames are ignored.
+		"""
+		# The author is always in the database of the profile that received the message
+		database = self.message.author.database
+		users = {}
+		for nickname in self.mentions:
+			user = database.find_user(nickname)
+			if user is not None:
+				users.setdefault(user.rowid, user)
+		return list(users.values())
+
+	@functools.cached_property
+	def command(self) -> Optional[str]:
+		"""
+		The casefolded command name without the prefix, or None if the message isn't a command.
+		"""
+		prefix = config.COMMAND_PREFIX
+		if not self.tokens or not self.tokens[0].startswith(prefix) or len(self.tokens[0]) == len(prefix):
+			return None
+		return self.tokens[0][len(prefix):].casefold()
+
+	@functools.cached_property
+	def args(self) -> List[str]:
+		"""
+		The tokens after the command name, or an empty list if the message isn't a command.
+		"""
+		return self.tokens[1:] if self.command is not None else []
+
+	@functools.cached_property
+	def arg_text(self) -> str:
+		"""
+		The text after the command name with its original spacing, apart from leading and trailing whitespace,
+		or an empty string if the message isn't a command.
+		"""
+		if self.command is None:
+			return ''
+		return self.text.strip()[len(self.tokens[0]):].strip()
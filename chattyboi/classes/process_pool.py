@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import time
+from typing import Callable, Dict, Optional, Set
+
+
+def _timed_call(fn, args, kwargs):
+	start = time.perf_counter()
+	result = fn(*args, **kwargs)
+	return result, time.perf_counter() - start
+
+
+@dataclasses.dataclass
+class OffloadStats:
+	"""
+	Usage of the process pool by a single extension. `busy_time` is the total time spent running its jobs in workers.
+	"""
+	submitted: int = 0
+	completed: int = 0
+	failed: int = 0
+	cancelled: int = 0
+	in_flight: int = 0
+	busy_time: float = 0.0
+
+	def snapshot(self) -> dict:
+		return dataclasses.asdict(self)
+
+
+class ProcessPool:
+	"""
+	Shared, size-limited process pool for CPU-bound work that would otherwise block the event loop.
+	The executor is only created when the first job is submitted, and `shutdown()` cancels all jobs that
+	haven't started yet. Usage is tracked per owner, which is usually an extension's source.
+
+	Submitted callables and their arguments and results must be picklable, and callables must be importable
+	by the worker processes. Functions defined in extension modules are only importable when workers are forked,
+	which is the default on Linux; elsewhere, put them in a module that is importable by name.
+	"""
+
+	def __init__(self, max_workers: int):
+		self.max_workers = max_workers
+		self.stats: Dict[Optional[str], OffloadStats] = {}
+		self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+		self._futures: Set[concurrent.futures.Future] = set()
+		self._start_time: Optional[float] = None
+
+	@property
+	def running(self):
+		return self._executor is not None
+
+	@property
+	def in_flight(self):
+		return len(self._futures)
+
+	@property
+	def queue_depth(self):
+		"""
+		Number of submitted jobs that are waiting for a free worker.
+		"""
+		return max(0, self.in_flight - self.max_workers)
+
+	@property
+	def utilization(self):
+		"""
+		Fraction of the available worker time that was spent running jobs since the executor was created.
+		"""
+		return self._utilization(sum(s.busy_time for s in self.stats.values()))
+
+	def _utilization(self, busy_time):
+		if self._start_time is None:
+			return 0.0
+		available = (time.perf_counter() - self._start_time) * self.max_workers
+		return min(1.0, busy_time / available) if available else 0.0
+
+	async def run(self, owner: Optional[str], fn: Callable, *args, **kwargs):
+		"""
+		Run `fn(*args, **kwargs)` in a worker process and return its result, raising any exception it raised.
+		"""
+		if self._executor is None:
+			self._executor = concurrent.futures.ProcessPoolExecutor(self.max_workers)
+			self._start_time = time.perf_counter()
+		stats = self.stats.setdefault(owner, OffloadStats())
+		future = self._executor.submit(_timed_call, fn, args, kwargs)
+		self._futures.add(future)
+		stats.submitted += 1
+		stats.in_flight += 1
+		try:
+			result, busy_time = await asyncio.wrap_future(future)
+		except (asyncio.CancelledError, concurrent.futures.CancelledError):
+			future.cancel()
+			stats.cancelled += 1
+			raise
+		except Exception:
+			stats.failed += 1
+			raise
+		finally:
+			self._futures.discard(future)
+			stats.in_flight -= 1
+		stats.completed += 1
+		stats.busy_time += busy_time
+		return result
+
+	def snapshot(self) -> dict:
+		return {
+			'max_workers': self.max_workers,
+			'in_flight': self.in_flight,
+			'queue_depth': self.queue_depth,
+			'utilization': self.utilization,
+			'owners': {
+				owner: {**stats.snapshot(), 'utilization': self._utilization(stats.busy_time)}
+				for owner, stats in self.stats.items()
+			}
+		}
+
+	def shutdown(self):
+		if self._executor is None:
+			return
+		for future in list(self._futures):
+			future.cancel()
+		self._executor.shutdown(wait=False)
+		self._executor = None
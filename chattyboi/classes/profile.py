@@ -43,14 +43,23 @@ class Profile:
 		if not self.extension_storage_path.is_dir():
 			self.extension_storage_path.mkdir(parents=True)
 		self.db_connection = sqlite3.connect(str(self.path / self.DATABASE_FILENAME), factory=chattyboi.DatabaseWrapper)
-		with open(pathlib.Path(__file__).parent / 'schema.sql') as schema:
+		with open(pathlib.Path(__file__).parent.parent / 'schema.sql') as schema:
 			self.db_connection.cursor().executescript(schema.read())
+		self.db_connection.build_nickname_index()
 
 	def cleanup(self):
 		self.db_connection.commit()
 		self.db_connection.close()
 		self.save_properties()
 
+	@classmethod
+	def read_name(cls, path: pathlib.Path) -> str:
+		"""
+		Read only the name of the profile at the given path, without loading it.
+		"""
+		with (path / cls.PROPERTIES_FILENAME).open() as f:
+			return json.load(f).get('name', cls.DEFAULT_PROPERTIES['name'])
+
 	def load_properties(self):
 		try:
 			self.properties = json.load((self.path / self.PROPERTIES_FILENAME).open())
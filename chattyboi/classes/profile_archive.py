@@ -0,0 +1,141 @@
+# SPDX-License-Identifier: Apache-2.0
+"""
+Exporting profiles into single compressed archives and importing them back.
+An archive is a gzipped tar file with the profile's properties file, database (and its write-ahead log, if any) and
+extension storage directory, named as in `Profile`.
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+import pathlib
+import sqlite3
+import tarfile
+import time
+from typing import BinaryIO, Callable, Optional, Union
+
+from . import Profile
+
+WAL_FILENAME = Profile.DATABASE_FILENAME + '-wal'
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _add_bytes(archive: tarfile.TarFile, name: str, data: bytes):
+	_add_file(archive, name, len(data), io.BytesIO(data))
+
+
+def _add_file(archive: tarfile.TarFile, name: str, size: int, file: BinaryIO):
+	info = tarfile.TarInfo(name)
+	info.size = size
+	info.mtime = int(time.time())
+	archive.addfile(info, file)
+
+
+class _SizedReader(io.RawIOBase):
+	"""
+	Reads exactly `size` bytes from a file that may be truncated while it's read, padding it with zeros.
+	"""
+	def __init__(self, file: BinaryIO, size: int, progress: Optional[Callable[[int], None]] = None):
+		self.file = file
+		self.remaining = size
+		self.progress = progress
+
+	def readable(self):
+		return True
+
+	def readinto(self, buffer):
+		n = min(len(buffer), self.remaining, COPY_CHUNK_SIZE)
+		data = self.file.read(n)
+		data += bytes(n - len(data))
+		buffer[:n] = data
+		self.remaining -= n
+		if self.progress:
+			self.progress(n)
+		return n
+
+
+def _add_database(archive: tarfile.TarFile, source: pathlib.Path, progress: Optional[Callable[[int, int], None]]):
+	"""
+	Stream a database that may be in use into the archive, without copying it anywhere first.
+	The files are read while a read transaction is open on a separate connection. In rollback journal mode, that lock
+	keeps writers from committing until the copy is done, so the database file alone is consistent. In WAL mode,
+	writers aren't blocked, and the database file is copied along with the WAL: pages that a checkpoint changes while
+	they're read come from WAL frames, which SQLite replays over the database file when the archive is imported, up to
+	the last complete transaction in the copy.
+	"""
+	wal = source.with_name(source.name + '-wal')
+	connection = sqlite3.connect(str(source), isolation_level=None)
+	try:
+		connection.execute('BEGIN')
+		page_size = connection.execute('PRAGMA page_size').fetchone()[0]
+		wal_mode = connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+		# Start the read transaction
+		connection.execute('SELECT count(*) FROM sqlite_master').fetchone()
+		files = [(Profile.DATABASE_FILENAME, source)] + ([(WAL_FILENAME, wal)] if wal_mode and wal.is_file() else [])
+		# A file can only get longer while it's read, by pages that are also in the WAL, so its current size suffices
+		sizes = [os.stat(path).st_size for _, path in files]
+		total, copied = sum(sizes), 0
+
+		def step(n):
+			nonlocal copied
+			copied += n
+			progress(copied // page_size, total // page_size)
+
+		for (name, path), size in zip(files, sizes):
+			with open(path, 'rb') as file:
+				_add_file(archive, name, size, _SizedReader(file, size, step if progress else None))
+		connection.execute('COMMIT')
+	finally:
+		connection.close()
+
+
+def export_profile(
+	profile: Profile, destination: Union[str, pathlib.Path], progress: Optional[Callable[[int, int], None]] = None
+) -> pathlib.Path:
+	"""
+	Write the profile into a compressed archive. This blocks for as long as the export takes, but only touches the
+	profile's database through its own connection, so it can run in a separate thread while the profile is in use.
+	Changes that haven't been committed by the profile's connection are not included.
+
+	:param progress: called with the number of database pages copied so far and the total number of pages, including
+		those of the write-ahead log
+	:return: path of the archive
+	"""
+	destination = pathlib.Path(destination)
+	properties = dict(profile.properties, extensions=list(profile.extensions))
+	with tarfile.open(destination, 'w:gz') as archive:
+		_add_bytes(archive, Profile.PROPERTIES_FILENAME, json.dumps(properties).encode('utf-8'))
+		if profile.db_path.is_file():
+			_add_database(archive, profile.db_path, progress)
+		if profile.extension_storage_path.is_dir():
+			archive.add(str(profile.extension_storage_path), arcname=Profile.EXTENSION_STORAGE_PATH)
+	return destination
+
+
+def import_profile(source: Union[str, pathlib.Path], destination: Union[str, pathlib.Path]) -> Profile:
+	"""
+	Restore an archive made by `export_profile()` into a new profile directory, which must not exist or be empty.
+
+	:raise ValueError: if the destination isn't empty or the archive contains unexpected paths
+	:return: the imported profile, which hasn't been initialized yet
+	"""
+	destination = pathlib.Path(destination)
+	if destination.exists() and any(destination.iterdir()):
+		raise ValueError(f'Cannot import a profile into "{destination}", which is not empty')
+	root = destination.resolve()
+	allowed = {Profile.PROPERTIES_FILENAME, Profile.DATABASE_FILENAME, WAL_FILENAME, Profile.EXTENSION_STORAGE_PATH}
+	with tarfile.open(source, 'r:*') as archive:
+		members = archive.getmembers()
+		for member in members:
+			path = (root / member.name).resolve()
+			if (
+				pathlib.PurePosixPath(member.name).parts[0] not in allowed or root not in path.parents
+				or not (member.isfile() or member.isdir())
+			):
+				raise ValueError(f'Unexpected entry "{member.name}" in profile archive "{source}"')
+		if Profile.PROPERTIES_FILENAME not in (member.name for member in members):
+			raise ValueError(f'"{source}" is not a profile archive: it has no {Profile.PROPERTIES_FILENAME}')
+		destination.mkdir(parents=True, exist_ok=True)
+		archive.extractall(str(destination), members)
+	return Profile(destination)
@@ -0,0 +1,146 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import dataclasses
+import functools
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+
+@dataclasses.dataclass
+class HandlerStats:
+	"""
+	Resource usage of a single registered handler (e.g. one `extapi.on_message` coroutine).
+	All times are in seconds. Wall time is measured from the start of a call until it finishes, including the time
+	spent waiting on other tasks; blocking time only counts the time spent actually running on the event loop,
+	during which nothing else (including the GUI) can make progress.
+	"""
+	name: str
+	kind: str
+	calls: int = 0
+	active: int = 0
+	total_time: float = 0.0
+	max_time: float = 0.0
+	blocking_time: float = 0.0
+	max_blocking_time: float = 0.0
+	exceptions: int = 0
+	last_exception: Optional[str] = None
+
+	def record(self, wall_time, blocking_time, exception=None):
+		self.calls += 1
+		self.total_time += wall_time
+		self.max_time = max(self.max_time, wall_time)
+		self.blocking_time += blocking_time
+		self.max_blocking_time = max(self.max_blocking_time, blocking_time)
+		if exception is not None:
+			self.exceptions += 1
+			self.last_exception = repr(exception)
+
+	def snapshot(self) -> dict:
+		return dataclasses.asdict(self)
+
+
+class ExtensionStats:
+	"""
+	Resource usage of all handlers registered by a single extension, keyed by "<kind>:<qualified name>".
+	The aggregate properties sum or maximize over every handler.
+	"""
+
+	def __init__(self):
+		self.handlers: Dict[str, HandlerStats] = {}
+
+	def handler(self, name, kind) -> HandlerStats:
+		key = f'{kind}:{name}'
+		if key not in self.handlers:
+			self.handlers[key] = HandlerStats(name, kind)
+		return self.handlers[key]
+
+	@property
+	def calls(self):
+		return sum(h.calls for h in self.handlers.values())
+
+	@property
+	def total_time(self):
+		return sum(h.total_time for h in self.handlers.values())
+
+	@property
+	def max_time(self):
+		return max((h.max_time for h in self.handlers.values()), default=0.0)
+
+	@property
+	def blocking_time(self):
+		return sum(h.blocking_time for h in self.handlers.values())
+
+	@property
+	def max_blocking_time(self):
+		return max((h.max_blocking_time for h in self.handlers.values()), default=0.0)
+
+	@property
+	def exceptions(self):
+		return sum(h.exceptions for h in self.handlers.values())
+
+	def reset(self):
+		self.handlers.clear()
+
+	def snapshot(self) -> dict:
+		return {
+			'calls': self.calls,
+			'total_time': self.total_time,
+			'max_time': self.max_time,
+			'blocking_time': self.blocking_time,
+			'max_blocking_time': self.max_blocking_time,
+			'exceptions': self.exceptions,
+			'handlers': {key: h.snapshot() for key, h in self.handlers.items()}
+		}
+
+
+class _TimedCoroutine:
+	"""
+	Awaitable that drives another awaitable step by step, measuring how long each step holds the event loop.
+	"""
+
+	def __init__(self, awaitable: Awaitable):
+		self.iterator = awaitable.__await__()
+		self.blocking_time = 0.0
+
+	def __await__(self):
+		value, exception = None, None
+		while True:
+			start = time.perf_counter()
+			try:
+				if exception is None:
+					yielded = self.iterator.send(value)
+				else:
+					yielded = self.iterator.throw(exception)
+			except StopIteration as e:
+				self.blocking_time += time.perf_counter() - start
+				return e.value
+			except BaseException:
+				self.blocking_time += time.perf_counter() - start
+				raise
+			self.blocking_time += time.perf_counter() - start
+			try:
+				value, exception = (yield yielded), None
+			except BaseException as e:
+				value, exception = None, e
+
+
+def instrument(coro: Callable[..., Awaitable], stats: HandlerStats) -> Callable[..., Awaitable]:
+	"""
+	Wrap an async function so that every call is recorded in `stats`. Exceptions are recorded and re-raised.
+	"""
+	@functools.wraps(coro)
+	async def wrapper(*args, **kwargs):
+		timed = _TimedCoroutine(coro(*args, **kwargs))
+		exception = None
+		stats.active += 1
+		start = time.perf_counter()
+		try:
+			return await timed
+		except Exception as e:
+			exception = e
+			raise
+		finally:
+			stats.active -= 1
+			stats.record(time.perf_counter() - start, timed.blocking_time, exception)
+	return wrapper
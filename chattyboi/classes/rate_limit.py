@@ -0,0 +1,239 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import abc
+import collections
+import time
+from typing import TYPE_CHECKING, Callable, Hashable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+	from . import KeyValueStore, Message
+
+
+class RateLimiter(abc.ABC):
+	"""
+	Base class for per-key rate limits, such as per-user command cooldowns.
+	Each key's state is a short list of numbers in a dict ordered by last update, so checks are O(1) and keys whose
+	state has returned to the default (e.g. a full bucket) are dropped from the front as time passes. At most
+	`max_keys` keys are kept; beyond that, the least recently updated ones are forgotten.
+	Keys are usually made with `key()` from a message and a scope: the author (USER), the chat (CHAT),
+	or both (USER_IN_CHAT).
+	If a store is attached with `attach()`, the state is loaded from it, and written back by `save()` whenever the
+	store flushes after a change, at most every `flush_delay` seconds of the store, so limits survive restarts.
+	"""
+	USER = 'user'
+	CHAT = 'chat'
+	USER_IN_CHAT = 'user_in_chat'
+
+	def __init__(self, max_keys=100000, clock: Callable[[], float] = time.monotonic):
+		self.max_keys = max_keys
+		self.clock = clock
+		# key -> [last update, *state]
+		self.entries: collections.OrderedDict[Hashable, List[float]] = collections.OrderedDict()
+		self.store: Optional[KeyValueStore] = None
+		self.store_key: Optional[str] = None
+		self.changed = False
+
+	def __len__(self):
+		return len(self.entries)
+
+	@property
+	@abc.abstractmethod
+	def ttl(self) -> float:
+		"""
+		Seconds without updates after which a key's state is the same as if it was never seen.
+		"""
+
+	@property
+	@abc.abstractmethod
+	def parameters(self) -> Tuple:
+		"""
+		The arguments that the limiter was created with, used to tell whether two limiters are configured the same.
+		"""
+
+	@classmethod
+	def key(cls, message: Message, scope=USER_IN_CHAT) -> Hashable:
+		if scope == cls.USER:
+			return message.author.rowid
+		if scope == cls.CHAT:
+			return str(message.source)
+		if scope == cls.USER_IN_CHAT:
+			return message.author.rowid, str(message.source)
+		raise ValueError(f'Unknown rate limit scope "{scope}"')
+
+	def _expire(self, now):
+		ttl = self.ttl
+		while self.entries:
+			key, entry = next(iter(self.entries.items()))
+			if now - entry[0] < ttl:
+				break
+			del self.entries[key]
+
+	def _update(self, key, entry):
+		self.entries[key] = entry
+		self.entries.move_to_end(key)
+		if len(self.entries) > self.max_keys:
+			self.entries.popitem(last=False)
+		self._changed()
+
+	def _changed(self):
+		if self.store is not None and not self.changed:
+			self.changed = True
+			self.store.request_flush()
+
+	@abc.abstractmethod
+	def hit(self, key: Hashable, cost=1) -> bool:
+		"""
+		Record an attempt for the key if it's allowed.
+
+		:return: True if the attempt is within the limit, False if it should be rejected
+		"""
+
+	@abc.abstractmethod
+	def retry_after(self, key: Hashable, cost=1) -> float:
+		"""
+		:return: Seconds until an attempt for the key would be allowed, or 0 if it would be allowed now
+		"""
+
+	def hit_message(self, message: Message, scope=USER_IN_CHAT, cost=1) -> bool:
+		return self.hit(self.key(message, scope), cost)
+
+	def reset(self, key: Hashable):
+		if self.entries.pop(key, None) is not None:
+			self._changed()
+
+	def attach(self, store: KeyValueStore, store_key: str):
+		"""
+		Restore the state saved under `store_key` and save it there from now on.
+		Times are stored as wall-clock time, so time spent while ChattyBoi wasn't running counts towards expiry.
+		"""
+		self.store, self.store_key = store, store_key
+		store.flush_hooks.append(self.save)
+		offset = self.clock() - time.time()
+		for key, updated, *state in store.get(store_key, []):
+			self.entries[tuple(key) if isinstance(key, list) else key] = [updated + offset, *state]
+		self.entries = collections.OrderedDict(sorted(self.entries.items(), key=lambda item: item[1][0]))
+		self._expire(self.clock())
+
+	def save(self):
+		if self.store is None or not self.changed:
+			return
+		self.changed = False
+		self._expire(self.clock())
+		offset = time.time() - self.clock()
+		self.store.set(
+			self.store_key, [[key, entry[0] + offset, *entry[1:]] for key, entry in self.entries.items()]
+		)
+
+
+class TokenBucket(RateLimiter):
+	"""
+	Allows bursts of up to `burst` attempts per key (by default `rate`), refilled at `rate` attempts per `per` seconds.
+	A cooldown is a bucket with a burst of 1; see `cooldown()`.
+	"""
+	def __init__(self, rate: float, per: float, burst: Optional[float] = None, **kwargs):
+		super().__init__(**kwargs)
+		if rate <= 0 or per <= 0:
+			raise ValueError('The rate and the period must be positive')
+		self.rate, self.per, self.burst = rate, per, burst
+		self.capacity = burst or rate
+		self.refill = rate / per
+
+	@property
+	def parameters(self):
+		return self.rate, self.per, self.burst
+
+	@classmethod
+	def cooldown(cls, seconds: float, **kwargs) -> TokenBucket:
+		return cls(1, seconds, 1, **kwargs)
+
+	@property
+	def ttl(self):
+		return self.capacity / self.refill
+
+	def tokens(self, key, now) -> float:
+		entry = self.entries.get(key)
+		if entry is None:
+			return self.capacity
+		return min(self.capacity, entry[1] + (now - entry[0]) * self.refill)
+
+	def hit(self, key, cost=1):
+		now = self.clock()
+		self._expire(now)
+		tokens = self.tokens(key, now)
+		if tokens < cost:
+			return False
+		self._update(key, [now, tokens - cost])
+		return True
+
+	def retry_after(self, key, cost=1):
+		return max(0.0, (cost - self.tokens(key, self.clock())) / self.refill)
+
+
+class SlidingWindow(RateLimiter):
+	"""
+	Allows up to `limit` attempts per key in any `window` seconds. To stay O(1) in time and memory per key, the count is
+	approximated from the current and the previous fixed window, weighting the latter by how much of it overlaps
+	the sliding window.
+	"""
+	def __init__(self, limit: int, window: float, **kwargs):
+		super().__init__(**kwargs)
+		if limit <= 0 or window <= 0:
+			raise ValueError('The limit and the window must be positive')
+		self.limit = limit
+		self.window = window
+
+	@property
+	def parameters(self):
+		return self.limit, self.window
+
+	@property
+	def ttl(self):
+		return 2 * self.window
+
+	def _state(self, key, now):
+		"""
+		:return: start of the current fixed window, attempts in it, attempts in the previous one
+		"""
+		start = now - now % self.window
+		entry = self.entries.get(key)
+		if entry is None:
+			return start, 0, 0
+		# The window of an entry is that of its last update, which keeps it valid when times are shifted by `attach()`
+		updated, count, previous = entry
+		previous_start = updated - updated % self.window
+		if previous_start == start:
+			return start, count, previous
+		if previous_start == start - self.window:
+			return start, 0, count
+		return start, 0, 0
+
+	def _estimate(self, now, start, count, previous):
+		return previous * (1 - (now - start) / self.window) + count
+
+	def hit(self, key, cost=1):
+		now = self.clock()
+		self._expire(now)
+		start, count, previous = self._state(key, now)
+		if self._estimate(now, start, count, previous) + cost > self.limit:
+			return False
+		self._update(key, [now, count + cost, previous])
+		return True
+
+	def retry_after(self, key, cost=1):
+		if cost > self.limit:
+			return float('inf')
+		now = self.clock()
+		start, count, previous = self._state(key, now)
+		if count + cost > self.limit:
+			# Wait for the next window, in which this window's attempts become the previous ones
+			elapsed, start, previous = 0.0, start + self.window, count
+			count = 0
+		else:
+			elapsed = now - start
+		if previous + count + cost <= self.limit:
+			needed = 0.0
+		else:
+			# The previous window's weight decreases linearly over the current one
+			needed = (1 - (self.limit - count - cost) / previous) * self.window
+		return max(0.0, start + needed - now) if needed > elapsed or start > now else 0.0
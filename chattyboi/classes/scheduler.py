@@ -0,0 +1,197 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import random
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class Timer:
+	"""
+	A periodic job managed by a Scheduler. Create these with `Scheduler.schedule()` and stop them with `cancel()`.
+	Every run is started in a copy of the context in which the timer was created.
+	"""
+
+	def __init__(self, scheduler, coro, interval, mode, overlap, jitter, delay, name):
+		self.scheduler: Scheduler = scheduler
+		self.coro: Callable[[], Awaitable] = coro
+		self.interval: float = interval
+		self.mode: str = mode
+		self.overlap: str = overlap
+		self.jitter: float = jitter
+		self.delay: float = delay
+		self.name: str = name
+		self.tasks: Set[asyncio.Task] = set()
+		self.queued = 0
+		self.runs = 0
+		self.skipped = 0
+		self.cancelled = False
+		self._base: Optional[float] = None
+		self.context = contextvars.copy_context()
+
+	def __repr__(self):
+		return f'<Timer {self.name} every {self.interval}s ({self.mode}, {self.overlap})>'
+
+	@property
+	def running(self):
+		return bool(self.tasks)
+
+	def cancel(self):
+		self.scheduler.cancel(self)
+
+
+class Scheduler:
+	"""
+	Heap-based scheduler that runs periodic coroutines on the event loop with a single wakeup handle.
+	Timers whose deadlines fall within `coalesce_window` seconds of each other are fired by the same wakeup.
+
+	Modes:
+		* FIXED_RATE - runs are started every `interval` seconds after the first one, regardless of how long they take,
+			so the period doesn't drift. If the loop falls behind, missed periods are skipped, not bunched up.
+		* FIXED_DELAY - the next run starts `interval` seconds after the previous one finishes.
+	Overlap policies, which apply to FIXED_RATE timers whose previous run hasn't finished yet:
+		* SKIP - don't start this run;
+		* QUEUE - start this run as soon as the previous one finishes;
+		* CONCURRENT - start this run immediately alongside the previous one.
+	Timers added before `start()` are started along with the scheduler. `stop()` cancels all timers and running jobs.
+	"""
+	FIXED_RATE = 'fixed_rate'
+	FIXED_DELAY = 'fixed_delay'
+	SKIP = 'skip'
+	QUEUE = 'queue'
+	CONCURRENT = 'concurrent'
+
+	def __init__(self, logger: logging.Logger, coalesce_window=0.01):
+		self.logger = logger
+		self.coalesce_window = coalesce_window
+		self.timers: Set[Timer] = set()
+		self.wakeups = 0
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+		self._heap: List[Tuple[float, int, Timer]] = []
+		self._counter = itertools.count()
+		self._handle: Optional[asyncio.Handle] = None
+		self._handle_deadline = math.inf
+
+	@property
+	def running(self):
+		return self._loop is not None
+
+	def schedule(
+		self, coro: Callable[[], Awaitable], interval: float, mode=FIXED_RATE, overlap=SKIP, jitter=0.0, delay=0.0,
+		name=None
+	) -> Timer:
+		"""
+		Run `coro()` every `interval` seconds, starting `delay` seconds after the scheduler starts (or now, if it's
+		already running). Each deadline is postponed by a random amount of up to `jitter` seconds, which doesn't
+		affect the period of FIXED_RATE timers.
+		"""
+		if interval <= 0:
+			raise ValueError('The interval must be positive')
+		if mode not in (self.FIXED_RATE, self.FIXED_DELAY):
+			raise ValueError(f'Unknown scheduling mode "{mode}"')
+		if overlap not in (self.SKIP, self.QUEUE, self.CONCURRENT):
+			raise ValueError(f'Unknown overlap policy "{overlap}"')
+		timer = Timer(
+			self, coro, interval, mode, overlap, jitter, delay, name or getattr(coro, '__qualname__', repr(coro))
+		)
+		self.timers.add(timer)
+		if self.running:
+			self._push(timer, self._loop.time() + delay)
+		return timer
+
+	def cancel(self, timer: Timer):
+		"""
+		Stop a timer and cancel its running jobs. Its heap entry is discarded lazily.
+		"""
+		timer.cancelled = True
+		timer.queued = 0
+		self.timers.discard(timer)
+		for task in list(timer.tasks):
+			task.cancel()
+
+	def start(self):
+		if self.running:
+			return
+		self._loop = asyncio.get_event_loop()
+		now = self._loop.time()
+		for timer in self.timers:
+			self._push(timer, now + timer.delay)
+
+	def stop(self):
+		for timer in list(self.timers):
+			self.cancel(timer)
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+			self._handle_deadline = math.inf
+		self._heap.clear()
+		self._loop = None
+
+	def _push(self, timer: Timer, base: float):
+		timer._base = base
+		deadline = base + (random.uniform(0, timer.jitter) if timer.jitter else 0)
+		heapq.heappush(self._heap, (deadline, next(self._counter), timer))
+		self._rearm()
+
+	def _rearm(self):
+		while self._heap and self._heap[0][2].cancelled:
+			heapq.heappop(self._heap)
+		if not self._heap:
+			return
+		deadline = self._heap[0][0]
+		if self._handle is not None:
+			if self._handle_deadline <= deadline:
+				return
+			self._handle.cancel()
+		self._handle = self._loop.call_at(deadline, self._wakeup)
+		self._handle_deadline = deadline
+
+	def _wakeup(self):
+		self._handle = None
+		self._handle_deadline = math.inf
+		self.wakeups += 1
+		now = self._loop.time()
+		due = []
+		while self._heap and self._heap[0][0] <= now + self.coalesce_window:
+			due.append(heapq.heappop(self._heap)[2])
+		for timer in due:
+			if not timer.cancelled:
+				self._fire(timer, now)
+		self._rearm()
+
+	def _fire(self, timer: Timer, now: float):
+		if timer.mode == self.FIXED_RATE:
+			if timer.running and timer.overlap == self.SKIP:
+				timer.skipped += 1
+			elif timer.running and timer.overlap == self.QUEUE:
+				timer.queued += 1
+			else:
+				self._run(timer)
+			missed = max(0, math.floor((now - timer._base) / timer.interval))
+			timer.skipped += missed
+			self._push(timer, timer._base + (missed + 1) * timer.interval)
+		else:
+			self._run(timer)
+
+	def _run(self, timer: Timer):
+		timer.runs += 1
+		task = timer.context.run(self._loop.create_task, timer.coro())
+		timer.tasks.add(task)
+		task.add_done_callback(lambda t: self._on_done(timer, t))
+
+	def _on_done(self, timer: Timer, task: asyncio.Task):
+		timer.tasks.discard(task)
+		if not task.cancelled() and (exception := task.exception()):
+			self.logger.error(f'Exception in scheduled job {timer.name}', exc_info=exception)
+		if timer.cancelled or not self.running:
+			return
+		if timer.queued:
+			timer.queued -= 1
+			self._run(timer)
+		elif timer.mode == self.FIXED_DELAY:
+			self._push(timer, self._loop.time() + timer.interval)
@@ -47,9 +47,10 @@ class User(QObject):
 		return self.exists() and self.rowid == other.rowid
 	
 	def exists(self):
-		c = self.database.cursor()
-		c.execute('SELECT rowid FROM user_info WHERE rowid = ?', (self.rowid,))
-		return bool(c.fetchone())
+		with self.database.timed('user.exists'):
+			c = self.database.cursor()
+			c.execute('SELECT rowid FROM user_info WHERE rowid = ?', (self.rowid,))
+			return bool(c.fetchone())
 	
 	@property
 	def name(self):
@@ -57,39 +58,49 @@ class User(QObject):
 	
 	@property
 	def nicknames(self):
-		c = self.database.cursor()
-		c.execute('SELECT nicknames FROM user_info WHERE rowid = ?', (self.rowid,))
-		return json.loads(c.fetchone()[0])
+		with self.database.timed('user.get_nicknames'):
+			c = self.database.cursor()
+			c.execute('SELECT nicknames FROM user_info WHERE rowid = ?', (self.rowid,))
+			return json.loads(c.fetchone()[0])
 	
 	@nicknames.setter
 	def nicknames(self, value):
-		self.database.cursor().execute(
-			'UPDATE user_info SET nicknames = ? WHERE rowid = ?',
-			(json.dumps(value), self.rowid)
-		)
+		with self.database.timed('user.set_nicknames'):
+			self.database.cursor().execute(
+				'UPDATE user_info SET nicknames = ? WHERE rowid = ?',
+				(json.dumps(value), self.rowid)
+			)
+			self.database.index_nicknames(self.rowid, value)
+		self.database.record_change('nicknames', self.rowid)
 	
 	@property
 	def created_on(self):
-		c = self.database.cursor()
-		c.execute('SELECT created_on FROM user_info WHERE rowid = ?', (self.rowid,))
-		return utils.timestamp_to_datetime(c.fetchone()[0])
+		with self.database.timed('user.get_created_on'):
+			c = self.database.cursor()
+			c.execute('SELECT created_on FROM user_info WHERE rowid = ?', (self.rowid,))
+			return utils.timestamp_to_datetime(c.fetchone()[0])
 	
 	@created_on.setter
 	def created_on(self, value: float):
-		self.database.cursor().execute('UPDATE user_info SET created_on = ? WHERE rowid = ?', (value, self.rowid))
+		with self.database.timed('user.set_created_on'):
+			self.database.cursor().execute('UPDATE user_info SET created_on = ? WHERE rowid = ?', (value, self.rowid))
+		self.database.record_change('created_on', self.rowid)
 	
 	@property
 	def extension_data(self):
-		c = self.database.cursor()
-		c.execute('SELECT extension_data FROM user_info WHERE rowid = ?', (self.rowid,))
-		return json.loads(c.fetchone()[0])
+		with self.database.timed('user.get_extension_data'):
+			c = self.database.cursor()
+			c.execute('SELECT extension_data FROM user_info WHERE rowid = ?', (self.rowid,))
+			return json.loads(c.fetchone()[0])
 	
 	@extension_data.setter
 	def extension_data(self, value: dict):
-		self.database.cursor().execute(
-			'UPDATE user_info SET extension_data = ? WHERE rowid = ?',
-			(json.dumps(value), self.rowid)
-		)
+		with self.database.timed('user.set_extension_data'):
+			self.database.cursor().execute(
+				'UPDATE user_info SET extension_data = ? WHERE rowid = ?',
+				(json.dumps(value), self.rowid)
+			)
+		self.database.record_change('extension_data', self.rowid)
 	
 	def get_data(self, extension):
 		return self.extension_data.get(extension.hash, {})
@@ -0,0 +1,227 @@
+# SPDX-License-Identifier: Apache-2.0
+from __future__ import annotations
+
+import asyncio
+import csv
+import dataclasses
+import itertools
+import json
+import logging
+import pathlib
+import string
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import chattyboi
+import utils
+
+# SQLite's NOCASE collation, used by user_nicknames, only folds ASCII letters
+_NOCASE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def read_rows(path: Union[str, pathlib.Path]) -> Iterator[dict]:
+	"""
+	Stream rows from a CSV file with a header line, or from a JSON Lines file with one object per line.
+	The format is chosen by the file extension: .csv, or .jsonl/.ndjson.
+	"""
+	path = pathlib.Path(path)
+	suffix = path.suffix.lower()
+	if suffix == '.csv':
+		with path.open(newline='', encoding='utf-8-sig') as f:
+			yield from csv.DictReader(f)
+	elif suffix in ('.jsonl', '.ndjson'):
+		with path.open(encoding='utf-8') as f:
+			for line in f:
+				if line.strip():
+					yield json.loads(line)
+	else:
+		raise ValueError(f'Cannot import users from "{path}": expected a .csv, .jsonl or .ndjson file')
+
+
+@dataclasses.dataclass
+class ImportProgress:
+	rows_read: int = 0
+	users_added: int = 0
+	users_merged: int = 0
+	rows_skipped: int = 0
+	started: float = dataclasses.field(default_factory=time.perf_counter)
+	finished: Optional[float] = None
+
+	@property
+	def elapsed(self) -> float:
+		return (self.finished or time.perf_counter()) - self.started
+
+	@property
+	def rows_per_second(self) -> float:
+		return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+	def __str__(self):
+		return (
+			f'{self.rows_read} rows read ({self.rows_per_second:.0f}/s): {self.users_added} users added, '
+			f'{self.users_merged} merged, {self.rows_skipped} skipped'
+		)
+
+
+class UserImporter:
+	"""
+	Bulk importer of users from other bots' exports.
+	Every row is mapped onto a new user: `nickname_columns` lists the columns that hold nicknames (strings or,
+	in JSON Lines, lists of strings) with the preferred one first, and `data_columns` maps extension hashes
+	to {key: column} dictionaries that make up the extension data. `converters` optionally maps column names to
+	callables that convert their values, which is needed for numbers in CSV files.
+	Rows without nicknames are skipped. Rows with a nickname that already exists, in the database or earlier in
+	the input, are skipped or, with `on_conflict=MERGE`, have their extension data merged into the existing user.
+
+	Rows are inserted with `executemany()` in transactions of `batch_size` rows, yielding to the event loop in
+	between. With `defer_indexes`, if the profile has no users yet, the nickname indexes are dropped during the import
+	and rebuilt once at the end; only use this while nothing else uses the database, since every nickname lookup
+	is a full scan until then. Rows imported before an error are kept.
+	"""
+	SKIP = 'skip'
+	MERGE = 'merge'
+
+	def __init__(
+		self, database: chattyboi.DatabaseWrapper, nickname_columns: Iterable[str],
+		data_columns: Dict[str, Dict[str, str]] = None, converters: Dict[str, Callable] = None,
+		on_conflict=SKIP, batch_size=10000, defer_indexes=False, logger: Optional[logging.Logger] = None
+	):
+		if on_conflict not in (self.SKIP, self.MERGE):
+			raise ValueError(f'Unknown conflict mode "{on_conflict}"')
+		self.database = database
+		self.nickname_columns = tuple(nickname_columns)
+		self.data_columns = data_columns or {}
+		self.converters = converters or {}
+		self.on_conflict = on_conflict
+		self.batch_size = batch_size
+		self.defer_indexes = defer_indexes
+		self.logger = logger
+
+	def _value(self, row, column):
+		value = row.get(column)
+		if value in (None, '') or column not in self.converters:
+			return value
+		return self.converters[column](value)
+
+	def _nicknames(self, row) -> List[str]:
+		nicknames = []
+		for column in self.nickname_columns:
+			value = row.get(column)
+			for nickname in value if isinstance(value, list) else [value]:
+				if nickname and nickname not in nicknames:
+					nicknames.append(str(nickname))
+		return nicknames
+
+	def _extension_data(self, row) -> dict:
+		data = {}
+		for extension, columns in self.data_columns.items():
+			values = {key: self._value(row, column) for key, column in columns.items()}
+			values = {key: value for key, value in values.items() if value not in (None, '')}
+			if values:
+				data[extension] = values
+		return data
+
+	@staticmethod
+	def _merge(target: dict, data: dict):
+		for extension, values in data.items():
+			target.setdefault(extension, {}).update(values)
+
+	def _drop_indexes(self) -> List[str]:
+		c = self.database.cursor()
+		indexes = c.execute(
+			"SELECT name, sql FROM sqlite_master "
+			"WHERE type = 'index' AND tbl_name = 'user_nicknames' AND sql IS NOT NULL"
+		).fetchall()
+		for name, _ in indexes:
+			c.execute(f'DROP INDEX "{name}"')
+		return [sql for _, sql in indexes]
+
+	def _find_user_id(self, nicknames) -> Optional[int]:
+		c = self.database.cursor()
+		for nickname in nicknames:
+			c.execute('SELECT user_id FROM user_nicknames WHERE nickname = ? LIMIT 1', (nickname,))
+			if row := c.fetchone():
+				return row[0]
+		return None
+
+	def _write_batch(self, added: Dict[int, Tuple[List[str], dict]], merged: Dict[int, dict]):
+		c = self.database.cursor()
+		timestamp = utils.utc_timestamp()
+		c.executemany(
+			'INSERT INTO user_info (rowid, nicknames, created_on, extension_data) VALUES (?, ?, ?, ?)',
+			((rowid, json.dumps(nicknames), timestamp, json.dumps(data)) for rowid, (nicknames, data) in added.items())
+		)
+		c.executemany(
+			'INSERT INTO user_nicknames (nickname, user_id) VALUES (?, ?)',
+			((nickname, rowid) for rowid, (nicknames, _) in added.items() for nickname in nicknames)
+		)
+		updates = []
+		for rowid, data in merged.items():
+			c.execute('SELECT extension_data FROM user_info WHERE rowid = ?', (rowid,))
+			existing = json.loads(c.fetchone()[0])
+			self._merge(existing, data)
+			updates.append((json.dumps(existing), rowid))
+		c.executemany('UPDATE user_info SET extension_data = ? WHERE rowid = ?', updates)
+		self.database.commit()
+		for rowid in added:
+			self.database.record_change('added', rowid)
+		for rowid in merged:
+			self.database.record_change('extension_data', rowid)
+
+	async def run(
+		self, rows: Iterable[dict], progress: Optional[Callable[[ImportProgress], None]] = None
+	) -> ImportProgress:
+		"""
+		Import the rows, calling `progress` after every batch.
+
+		:return: final counts and timing
+		"""
+		status = ImportProgress()
+		c = self.database.cursor()
+		empty = not c.execute('SELECT 1 FROM user_nicknames LIMIT 1').fetchone()
+		deferred_indexes = self._drop_indexes() if empty and self.defer_indexes else []
+		# Nicknames imported in this run, folded like the NOCASE collation of user_nicknames
+		imported: Dict[str, int] = {}
+		rows = iter(rows)
+		try:
+			while batch := list(itertools.islice(rows, self.batch_size)):
+				# Users may have been added while this yielded to the event loop, so rowids are assigned from the
+				# current maximum, and nothing else runs between here and the batch's commit.
+				# Without deferred indexes, the database may be in use, so existing nicknames are looked up again.
+				if not deferred_indexes:
+					empty = not c.execute('SELECT 1 FROM user_nicknames LIMIT 1').fetchone()
+				next_rowid = c.execute('SELECT COALESCE(MAX(rowid), 0) FROM user_info').fetchone()[0] + 1
+				added: Dict[int, Tuple[List[str], dict]] = {}
+				merged: Dict[int, dict] = {}
+				for row in batch:
+					status.rows_read += 1
+					nicknames = self._nicknames(row)
+					if not nicknames:
+						status.rows_skipped += 1
+						continue
+					folded = [nickname.translate(_NOCASE) for nickname in nicknames]
+					rowid = next((imported[n] for n in folded if n in imported), None)
+					if rowid is None and not empty:
+						rowid = self._find_user_id(nicknames)
+					if rowid is None:
+						added[next_rowid] = (nicknames, self._extension_data(row))
+						imported.update((n, next_rowid) for n in folded)
+						next_rowid += 1
+						status.users_added += 1
+					elif self.on_conflict == self.MERGE:
+						target = added[rowid][1] if rowid in added else merged.setdefault(rowid, {})
+						self._merge(target, self._extension_data(row))
+						status.users_merged += 1
+					else:
+						status.rows_skipped += 1
+				self._write_batch(added, merged)
+				if progress:
+					progress(status)
+				await asyncio.sleep(0)
+		finally:
+			for sql in deferred_indexes:
+				c.execute(sql)
+			self.database.commit()
+			status.finished = time.perf_counter()
+			if self.logger:
+				self.logger.info(f'User import finished in {status.elapsed:.1f}s: {status}')
+		return status
@@ -1,9 +1,12 @@
+"""
+Global configuration. The QSettings stores and the values read from them are only created on first access,
+so that importing this module doesn't touch the disk.
+"""
 import logging
+import os
 import sys
 from pathlib import Path
 
-from PySide2.QtCore import QSettings
-
 RESET = False
 
 QT_APP_NAME = 'ChattyBoi'
@@ -13,16 +16,44 @@ LOG_FORMAT = '%(asctime)s:%(name)s: [%(levelname)s] %(message)s'
 LOG_DATEFMT = '%H:%M:%S'
 LOG_LEVEL = logging.DEBUG if '--debug' in sys.argv else logging.WARNING
 
-system_settings = QSettings(QSettings.SystemScope, QT_APP_NAME, QT_ORG_NAME)
-user_settings = QSettings(QSettings.UserScope, QT_APP_NAME, QT_ORG_NAME)
-
 _installation_path = Path('.').resolve()
 
 
+def _settings(scope):
+    from PySide2.QtCore import QSettings
+    return QSettings(getattr(QSettings, scope), QT_APP_NAME, QT_ORG_NAME)
+
+
+_LAZY = {
+    'system_settings': lambda: _settings('SystemScope'),
+    'user_settings': lambda: _settings('UserScope'),
+    'LOG_TO_FILE': lambda: (
+        '--log-file' in sys.argv or str(__getattr__('user_settings').value('log to file', False)).lower() == 'true'
+    ),
+    'LOOP_STALL_THRESHOLD': lambda: float(__getattr__('user_settings').value('loop stall threshold', 0.25)),
+    'CHAT_LOG_LIMIT': lambda: int(__getattr__('user_settings').value('chat log limit', 5000)),
+    'STATUS_LOG_LIMIT': lambda: int(__getattr__('user_settings').value('status log limit', 2000)),
+    'METRICS_PORT': lambda: int(__getattr__('user_settings').value('metrics port', 0)),
+    'PROCESS_POOL_SIZE': lambda: int(
+        __getattr__('user_settings').value('process pool size', min(4, os.cpu_count() or 1))
+    ),
+    'COMMAND_PREFIX': lambda: str(__getattr__('user_settings').value('command prefix', '!')),
+}
+
+
+def __getattr__(name):
+    if name in globals():
+        return globals()[name]
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = globals()[name] = _LAZY[name]()
+    return value
+
+
 def reset():
-    system_settings.clear()
-    user_settings.clear()
-    user_settings.setValue('profile paths', [_installation_path])
+    __getattr__('system_settings').clear()
+    __getattr__('user_settings').clear()
+    __getattr__('user_settings').setValue('profile paths', [_installation_path])
 
 
 if RESET:
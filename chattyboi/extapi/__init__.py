@@ -3,3 +3,10 @@ from ._logging import *
 from .extensions import this, get as get_extension
 from .initialization import *
 from .types import *
+from .profiling import *
+from .processes import *
+from .metrics import *
+from .database import *
+from .profiles import *
+from .storage import *
+from .rate_limits import *
@@ -1,6 +1,5 @@
 import logging
-import chattyboi
-from . import state
+from ._state import state
 
 NOTSET = logging.NOTSET
 DEBUG = logging.DEBUG
@@ -12,15 +11,16 @@ CRITICAL = logging.CRITICAL
 
 def log(level, message: str):
 	"""
-	Log to the chattyboi logger. If your extension runs its own processing, it may make sense to use your own logger.
+	Log to the chattyboi logger of the calling extension's profile. If your extension runs its own processing,
+	it may make sense to use your own logger.
 	The levels are the same as in the ``logging`` module.
 	"""
-	chattyboi.logger.log(level, message)
+	state().logger.log(level, message)
 
 
 def log_handler():
 	"""
-	:return: The global application state's logging handler (i.e. outputs to the status widget)
+	:return: The logging handler of the calling extension's profile, which passes records to the status widget,
+		the console and the log file without blocking the caller
 	"""
-	# FIXME: make this handler a part of the state directly
-	return state().main_window.dashboardTab.statusWidget.handler
+	return state().log_pipeline.queue_handler
@@ -1,8 +1,22 @@
+import inspect
+
 import state as cb_state
 
 
 def state():
 	"""
-	:return: The current global application state
+	:return: The application state of the profile that the calling extension belongs to. Outside of the contexts in
+		which ChattyBoi runs extension code (loading, event handlers, scheduled jobs and the tasks they create), it is
+		found from the innermost extension module on the call stack.
+	:raise: RuntimeError if several profiles are running and the caller can't be attributed to any of them
 	"""
-	return cb_state.state
+	app_state = cb_state.current.get(None)
+	if app_state is not None:
+		return app_state
+	frame = inspect.currentframe().f_back
+	while frame is not None:
+		app_state = cb_state.for_module(frame.f_globals.get('__name__', ''))
+		if app_state is not None:
+			return app_state
+		frame = frame.f_back
+	return cb_state.get()
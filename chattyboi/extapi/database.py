@@ -1,9 +1,14 @@
-from typing import Optional
+import inspect
+import pathlib
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from classes import ImportProgress, UserImporter, read_rows
 from .types import User
-from . import _state
+from ._state import state
+from . import extensions
 
 
-__all__ = ('self_user', 'find_user', 'find_or_add_user')
+__all__ = ('self_user', 'find_user', 'find_or_add_user', 'find_users_by_prefix', 'import_users', 'ImportProgress')
 
 
 def self_user() -> User:
@@ -16,12 +21,53 @@ def self_user() -> User:
 
 	:return: The User object associated with the bot
 	"""
-	return _state().database.self_user()
+	return state().database.self_user()
 
 
 def find_user(nickname) -> Optional[User]:
-	return _state().database.find_user(nickname)
+	return state().database.find_user(nickname)
 
 
 def find_or_add_user(nickname) -> User:
-	return _state().database.find_or_add_user(nickname)
+	return state().database.find_or_add_user(nickname)
+
+
+def find_users_by_prefix(prefix: str, limit: Optional[int] = 10) -> List[User]:
+	"""
+	Find users with a nickname that starts with the prefix, ignoring case, using an in-memory index. This is meant for
+	completing and resolving partial mentions.
+
+	:param limit: maximum number of users to return, or None for all of them
+	:return: Users in alphabetical order of their matching nickname, so an exact match comes first
+	"""
+	database = state().database
+	return [User(database, rowid) for _, rowid in state().nickname_index.search(prefix, limit)]
+
+
+def import_users(
+	source: Union[str, pathlib.Path, Iterable[dict]], nickname_columns: Iterable[str],
+	data_columns: Dict[str, str] = None, converters: Dict[str, Callable] = None, on_conflict=UserImporter.SKIP,
+	progress: Optional[Callable[[ImportProgress], None]] = None
+) -> Awaitable[ImportProgress]:
+	"""
+	Bulk import users, e.g. when migrating a community from another bot. This is much faster than calling
+	``find_or_add_user()`` and ``User.store_data()`` for every user.
+
+	:param source: a .csv (with a header line), .jsonl or .ndjson file, which is streamed, or an iterable of dictionaries
+	:param nickname_columns: columns holding the user's nicknames, preferred first
+	:param data_columns: {key: column} mapping of the calling extension's data to store for each user
+	:param converters: {column: callable} mapping used to convert values, e.g. ``{'points': int}`` for CSV files
+	:param on_conflict: ``"skip"`` rows whose nickname already exists, or ``"merge"`` their data into the existing user
+	:param progress: called after every batch with the running counts and rows per second
+	:return: an awaitable of the final counts and timing; the calling extension is found when this is called, so it
+		can be gathered or wrapped in a task
+	"""
+	extension = extensions.get(inspect.currentframe().f_back.f_globals['__name__'].split('.', 1)[0])
+	if data_columns and extension is None:
+		raise RuntimeError('import_users() with data_columns must be called directly from within an extension')
+	importer = UserImporter(
+		state().database, nickname_columns, {extension.hash: data_columns} if data_columns else None, converters,
+		on_conflict, logger=state().logger
+	)
+	rows = read_rows(source) if isinstance(source, (str, pathlib.Path)) else source
+	return importer.run(rows, progress)
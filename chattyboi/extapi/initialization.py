@@ -1,12 +1,22 @@
-import asyncio
+import inspect
 from typing import Awaitable, Callable
 
-from qasync import asyncSlot
-
-from .types import Chat, Message
+import classes.profiling
+from classes import EventBus, Scheduler, Timer
+from .types import Chat, Message, UserChanges
 from ._state import state
+from . import extensions
+
+__all__ = (
+	'register_chat', 'unregister_chat', 'on_ready', 'always_run', 'schedule', 'on_message', 'on_users_changed',
+	'on_cleanup', 'on_event', 'EventBus', 'FIXED_RATE', 'FIXED_DELAY', 'SKIP', 'QUEUE', 'CONCURRENT'
+)
 
-__all__ = ('register_chat', 'on_ready', 'always_run', 'on_message', 'on_cleanup')
+FIXED_RATE = Scheduler.FIXED_RATE
+FIXED_DELAY = Scheduler.FIXED_DELAY
+SKIP = Scheduler.SKIP
+QUEUE = Scheduler.QUEUE
+CONCURRENT = Scheduler.CONCURRENT
 
 
 def register_chat(chat: Chat):
@@ -17,45 +27,111 @@ def register_chat(chat: Chat):
 	state().add_chat(chat)
 
 
+def unregister_chat(chat: Chat):
+	"""
+	Remove a previously registered Chat, e.g. when a channel is deleted or left. Its messages are no longer forwarded
+	to ``on_message`` handlers.
+	"""
+	state().remove_chat(chat)
+
+
+def _instrumented(coro, kind):
+	"""
+	Wrap a handler so that its resource usage is recorded in the stats of the extension that defines it.
+	If the handler doesn't belong to a loaded extension, it is returned unchanged.
+	"""
+	extension = extensions.get(getattr(coro, '__module__', '').split('.', 1)[0])
+	if extension is None:
+		return coro
+	return classes.profiling.instrument(coro, extension.stats.handler(coro.__qualname__, kind))
+
+
 def on_ready(coro: Callable[[], Awaitable]):
 	"""
 	Decorator over async functions that will be executed on startup.
 
-	Shorthand for ``state().ready.connect(asyncSlot()(coro))``
+	Shorthand for ``state().bus.subscribe(EventBus.READY, coro)``
 	"""
-	state().ready.connect(asyncSlot()(coro))
+	state().bus.subscribe(EventBus.READY, _instrumented(coro, 'on_ready'))
 	return coro
 
 
-def always_run(interval=1):
+def always_run(interval=1, mode=FIXED_RATE, overlap=SKIP, jitter=0.0):
 	"""
+	Shorthand for ``schedule()`` as a decorator. The first run happens on startup.
+
 	:param interval: Interval in seconds (default 1)
 	:return: Decorator over an async function that will run repeatedly with the specified interval
 	"""
 	def deco(coro):
-		async def repeat():
-			while asyncio.get_event_loop().is_running():
-				await coro()
-				await asyncio.sleep(interval)
-		state().ready.connect(lambda: asyncio.get_event_loop().create_task(repeat()))
+		schedule(_instrumented(coro, 'always_run'), interval, mode, overlap, jitter)
+		return coro
 	return deco
 
 
+def schedule(
+	coro: Callable[[], Awaitable], interval: float, mode=FIXED_RATE, overlap=SKIP, jitter=0.0, delay=0.0
+) -> Timer:
+	"""
+	Run an async function periodically using the state's scheduler. Jobs are started once the state is ready
+	(or immediately, if it already is) and cancelled on cleanup.
+
+	:param interval: Interval in seconds
+	:param mode: ``FIXED_RATE`` to start runs every ``interval`` seconds regardless of how long they take,
+		or ``FIXED_DELAY`` to wait ``interval`` seconds after each run finishes
+	:param overlap: What to do when a ``FIXED_RATE`` run is due while the previous one is still running:
+		``SKIP`` it, ``QUEUE`` it until the previous one finishes, or run both ``CONCURRENT``-ly
+	:param jitter: Maximum random delay in seconds added to each run, which doesn't affect the period
+	:param delay: Delay in seconds before the first run
+	:return: Timer object, which can be stopped with ``cancel()``
+	"""
+	return state().scheduler.schedule(coro, interval, mode, overlap, jitter, delay)
+
+
 def on_message(coro: Callable[[Message], Awaitable]):
 	"""
 	Decorator over async functions that will be called with a ``Message`` as the argument when any message is received.
 
-	Shorthand for ``state().anyMessageReceived.connect(asyncSlot()(coro))``
+	Shorthand for ``state().bus.subscribe(EventBus.MESSAGE_RECEIVED, coro)``
 	"""
-	state().anyMessageReceived.connect(asyncSlot(Message)(coro))
+	state().bus.subscribe(EventBus.MESSAGE_RECEIVED, _instrumented(coro, 'on_message'))
+	return coro
+
+
+def on_users_changed(coro: Callable[[UserChanges], Awaitable]):
+	"""
+	Decorator over async functions that will be called with a ``UserChanges`` object whenever users are added or
+	changed. Changes are coalesced, so there's at most one call per event loop iteration; the object contains sets of
+	rowids that were ``added`` or whose ``nicknames``, ``created_on`` or ``extension_data`` were changed.
+
+	Shorthand for ``state().bus.subscribe(EventBus.USERS_CHANGED, coro)``
+	"""
+	state().bus.subscribe(EventBus.USERS_CHANGED, _instrumented(coro, 'on_users_changed'))
 	return coro
 
 
 def on_cleanup(coro):
 	"""
-	Decorator over async functions that will be executed on cleanup (graceful shutdown).
+	Decorator over async functions that will be executed on cleanup (graceful shutdown). Cleanup waits for them to
+	finish, for up to ``ApplicationState.CLEANUP_TIMEOUT`` seconds, before flushing key-value stores and closing the
+	database, so they can still save their state.
 
-	Shorthand for ``state().cleanup.connect(asyncSlot()(coro))``
+	Shorthand for ``state().bus.subscribe(EventBus.CLEANUP, coro)``
 	"""
-	state().cleanup.connect(asyncSlot()(coro))
+	state().bus.subscribe(EventBus.CLEANUP, _instrumented(coro, 'on_cleanup'))
 	return coro
+
+
+def on_event(topic: str):
+	"""
+	Decorator over functions that will be called with the arguments of every event published on a topic of the
+	state's event bus, e.g. ``EventBus.CHAT_ADDED``. Async functions are started as tasks; plain functions are
+	called directly and must return quickly. Extensions can publish their own topics with ``state().bus.publish()``.
+	"""
+	def deco(handler):
+		if inspect.iscoroutinefunction(handler):
+			state().bus.subscribe(topic, _instrumented(handler, f'on_event {topic}'))
+		else:
+			state().bus.subscribe(topic, handler)
+		return handler
+	return deco
@@ -0,0 +1,38 @@
+from typing import Iterable
+
+from classes import Counter, Gauge, Histogram
+from ._state import state
+
+__all__ = ('counter', 'gauge', 'histogram', 'metrics_text')
+
+
+def counter(name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+	"""
+	Register a counter in the state's metrics registry, or get the existing one with the same name.
+	Prefix the name with something specific to your extension to avoid collisions.
+
+	Usage: ``counter('myext_commands_total', 'Commands run', ['command']).inc(command='hello')``
+	"""
+	return state().metrics.counter(name, help, labelnames)
+
+
+def gauge(name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+	"""
+	Register a gauge, a value that can go up and down, or get the existing one with the same name.
+	"""
+	return state().metrics.gauge(name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames: Iterable[str] = (), buckets=Histogram.DEFAULT_BUCKETS) -> Histogram:
+	"""
+	Register a histogram of observed values (usually durations in seconds), or get the existing one with the same name.
+	"""
+	return state().metrics.histogram(name, help, labelnames, buckets)
+
+
+def metrics_text() -> str:
+	"""
+	:return: All metrics in the Prometheus text format. They are also served over HTTP on localhost if the
+		"metrics port" setting is set.
+	"""
+	return state().metrics.render()
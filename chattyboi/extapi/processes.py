@@ -0,0 +1,34 @@
+import inspect
+from typing import Awaitable, Callable
+
+from . import extensions
+from ._state import state
+
+__all__ = ('run_in_process', 'process_pool_stats')
+
+
+def run_in_process(fn: Callable, *args, **kwargs) -> Awaitable:
+	"""
+	Run a CPU-bound function in the shared process pool so that it doesn't block the event loop and the GUI.
+	The pool is created on first use, limited by the "process pool size" setting, and shut down on cleanup.
+
+	The function, its arguments and its result must be picklable. Functions defined in extension modules can only be
+	used on platforms that fork worker processes (such as Linux); elsewhere, define them in an importable module.
+
+	This isn't a coroutine function: the calling extension is found when it's called, and the returned awaitable can
+	then be awaited, gathered or wrapped in a task like any coroutine.
+
+	Usage: ``result = await run_in_process(fn, arg)``
+
+	:return: an awaitable of the function's return value
+	:raise: any exception raised by the function, when awaited
+	"""
+	extension = extensions.get(inspect.currentframe().f_back.f_globals['__name__'].split('.', 1)[0])
+	return state().process_pool.run(extension.source if extension else None, fn, *args, **kwargs)
+
+
+def process_pool_stats() -> dict:
+	"""
+	:return: Queue depth and worker utilization of the process pool, in total and per extension source
+	"""
+	return state().process_pool.snapshot()
@@ -0,0 +1,29 @@
+import pathlib
+from typing import Optional, Union
+
+import classes
+from ._state import state
+
+__all__ = ('export_profile', 'import_profile')
+
+
+async def export_profile(path: Optional[Union[str, pathlib.Path]] = None) -> pathlib.Path:
+	"""
+	Back up the current profile (properties, user database and extension storage) into a ``.tar.gz`` archive
+	while ChattyBoi keeps running.
+
+	:param path: destination file; defaults to a timestamped file in the profile directory
+	:return: path of the archive
+	"""
+	return await state().export_profile(path)
+
+
+def import_profile(source: Union[str, pathlib.Path], destination: Union[str, pathlib.Path]) -> classes.Profile:
+	"""
+	Restore an archive made by ``export_profile()`` into a new profile directory.
+
+	:param destination: directory for the new profile; it must not exist or be empty
+	:return: the imported profile, which can be selected on the next start
+	:raise ValueError: if the destination isn't empty or the file isn't a profile archive
+	"""
+	return classes.import_profile(source, destination)
@@ -0,0 +1,35 @@
+import pathlib
+from typing import Optional, Union
+
+from .types import Extension
+from ._state import state
+
+__all__ = ('extension_stats', 'profiling_snapshot', 'export_profiling_snapshot')
+
+
+def extension_stats(extension: Extension) -> dict:
+	"""
+	Get the resource usage of handlers registered by an extension through ``on_message``, ``on_ready``,
+	``always_run`` and ``on_cleanup``. Times are in seconds; "blocking" time is the time during which the handler
+	held the event loop (and therefore the GUI).
+
+	:return: dictionary with aggregate values and a "handlers" dictionary with per-handler values
+	"""
+	return extension.stats.snapshot()
+
+
+def profiling_snapshot() -> dict:
+	"""
+	:return: Resource usage of all loaded extensions, keyed by extension source, along with the snapshot time
+	"""
+	return state().profiling_snapshot()
+
+
+def export_profiling_snapshot(path: Optional[Union[str, pathlib.Path]] = None) -> pathlib.Path:
+	"""
+	Write ``profiling_snapshot()`` to a JSON file.
+
+	:param path: destination file; defaults to a timestamped file in the profile directory
+	:return: path of the written file
+	"""
+	return state().export_profiling_snapshot(path)
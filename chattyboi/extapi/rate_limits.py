@@ -0,0 +1,76 @@
+import inspect
+from typing import Optional
+
+from classes import RateLimiter, TokenBucket, SlidingWindow
+from .types import Extension
+from ._state import state
+from . import extensions
+
+__all__ = ('rate_limiter', 'sliding_window', 'cooldown', 'RateLimiter', 'TokenBucket', 'SlidingWindow')
+
+
+def _namespace(extension: Optional[Extension], function: str) -> str:
+	if extension is None:
+		# Two frames up: the public function, then its caller
+		module = inspect.currentframe().f_back.f_back.f_globals['__name__']
+		extension = extensions.get(module.split('.', 1)[0])
+		if extension is None:
+			raise RuntimeError(f'{function}() without an extension must be called directly from within an extension')
+	return extension.hash
+
+
+def rate_limiter(
+	name: str, rate: float, per: float, burst: Optional[float] = None, persist=False,
+	extension: Optional[Extension] = None
+) -> TokenBucket:
+	"""
+	Get a token bucket rate limiter, which allows `rate` attempts per `per` seconds for each key, in bursts of up to
+	`burst` attempts. Calling this again with the same name and arguments returns the same limiter, so it can be
+	called from within a handler. Checks take constant time, and keys that are back at their full allowance are
+	forgotten, so memory only grows with the number of recently limited users and chats.
+
+	Usage::
+
+		@on_message
+		async def roll(message):
+			if message.parsed.command != 'roll':
+				return
+			if not rate_limiter('roll', 5, 60).hit_message(message, RateLimiter.USER):
+				return
+			...
+
+	:param persist: whether to keep the limiter's state across restarts, in the extension's key-value store, which
+		saves it about a second after it changes and on cleanup
+	:param extension: extension that owns the limiter; defaults to the one from which this function was called
+	:raise: RuntimeError if no extension was given and the caller isn't part of one
+	:raise: ValueError if the extension already has a limiter with that name but different arguments
+	"""
+	return state().rate_limiter(
+		_namespace(extension, 'rate_limiter'), name, TokenBucket, rate, per, burst, persist=persist
+	)
+
+
+def sliding_window(
+	name: str, limit: int, window: float, persist=False, extension: Optional[Extension] = None
+) -> SlidingWindow:
+	"""
+	Like `rate_limiter()`, but allows up to `limit` attempts in any `window` seconds instead of refilling gradually.
+	"""
+	return state().rate_limiter(
+		_namespace(extension, 'sliding_window'), name, SlidingWindow, limit, window, persist=persist
+	)
+
+
+def cooldown(name: str, seconds: float, persist=False, extension: Optional[Extension] = None) -> TokenBucket:
+	"""
+	Like `rate_limiter()`, but allows one attempt per key every `seconds` seconds.
+
+	Usage::
+
+		limiter = cooldown('hug', 30)
+		if not limiter.hit_message(message):
+			await message.reply(f'Try again in {limiter.retry_after(RateLimiter.key(message)):.0f}s')
+	"""
+	return state().rate_limiter(
+		_namespace(extension, 'cooldown'), name, TokenBucket, 1, seconds, 1, persist=persist
+	)
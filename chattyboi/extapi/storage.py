@@ -0,0 +1,33 @@
+import inspect
+from typing import Optional
+
+from classes import KeyValueStore
+from .types import Extension
+from ._state import state
+from . import extensions
+
+__all__ = ('kv_store', 'KeyValueStore')
+
+
+def kv_store(extension: Optional[Extension] = None) -> KeyValueStore:
+	"""
+	Get an extension's persistent key-value store, which lives in the profile's database.
+	Use it instead of rewriting files in ``Extension.storage_path`` for small pieces of state: reads are cached,
+	and writes are batched and committed shortly after they're made, as well as on cleanup.
+
+	Usage::
+
+		store = kv_store()
+		store['greeting'] = 'Hello!'
+		store.set('counters/alice', store.get('counters/alice', 0) + 1)
+		for key, value in store.scan('counters/'):
+			...
+
+	:param extension: extension whose store to get; defaults to the one from which this function was called
+	:raise: RuntimeError if no extension was given and the caller isn't part of one
+	"""
+	if extension is None:
+		extension = extensions.get(inspect.currentframe().f_back.f_globals['__name__'].split('.', 1)[0])
+		if extension is None:
+			raise RuntimeError('kv_store() without an extension must be called directly from within an extension')
+	return state().kv_store(extension.hash)
@@ -1 +1 @@
-from classes import Chat, Extension, Message, MessageContent, User, Profile
+from classes import Chat, Extension, Message, MessageContent, ParsedMessage, User, UserChanges, Profile
@@ -1,3 +1,17 @@
-from .widgets import *
-from .tabs import *
-from .windows import *
+"""
+Submodules are only imported when one of their attributes is first accessed through this package,
+so that showing the profile dialog doesn't import every widget.
+"""
+import importlib
+
+_SUBMODULES = ('windows', 'tabs', 'widgets', 'models')
+
+
+def __getattr__(name):
+	for submodule in _SUBMODULES:
+		module = importlib.import_module(f'.{submodule}', __name__)
+		if hasattr(module, name):
+			value = getattr(module, name)
+			globals()[name] = value
+			return value
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
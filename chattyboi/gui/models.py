@@ -0,0 +1,255 @@
+import datetime
+import json
+import weakref
+
+from PySide2.QtCore import Qt, QAbstractListModel, QAbstractTableModel, QModelIndex
+
+import utils
+
+
+class ChatLogModel(QAbstractTableModel):
+	"""
+	Table model over a bounded ring buffer of messages. When the buffer is full, the oldest message is dropped
+	for each new one, so appending is O(1) regardless of how long the bot has been running.
+	The buffer is a list of `limit` slots and the position of the oldest row, so looking up any row is O(1) as well.
+	Rows are formatted lazily, the first time the view asks for them, and then cached alongside the message.
+	"""
+	COLUMNS = ['Time', 'Chat', 'Author', 'Message']
+
+	def __init__(self, limit, parent=None):
+		super().__init__(parent)
+		self.limit = limit
+		self.entries = [None] * limit
+		self.head = 0
+		self.count = 0
+
+	def rowCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else self.count
+
+	def columnCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self.COLUMNS)
+
+	def headerData(self, section, orientation, role=Qt.DisplayRole):
+		if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+			return self.COLUMNS[section]
+		return None
+
+	def data(self, index, role=Qt.DisplayRole):
+		if role != Qt.DisplayRole or not index.isValid():
+			return None
+		entry = self.entries[(self.head + index.row()) % self.limit]
+		if entry[1] is None:
+			entry[1] = self.format_message(entry[0])
+		return entry[1][index.column()]
+
+	def flags(self, index):
+		return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+	@staticmethod
+	def format_message(message):
+		return (
+			datetime.datetime.fromtimestamp(message.timestamp).strftime('%H:%M'),
+			str(message.source),
+			str(message.author),
+			str(message.content)
+		)
+
+	def append(self, message):
+		self.extend([message])
+
+	def extend(self, messages):
+		"""
+		Add messages as a single batch of rows, dropping as many of the oldest ones as needed to stay within the limit.
+		"""
+		messages = list(messages)[-self.limit:]
+		if not messages:
+			return
+		overflow = min(self.count, self.count + len(messages) - self.limit)
+		if overflow > 0:
+			self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+			for i in range(self.head, self.head + overflow):
+				self.entries[i % self.limit] = None
+			self.head = (self.head + overflow) % self.limit
+			self.count -= overflow
+			self.endRemoveRows()
+		row = self.count
+		self.beginInsertRows(QModelIndex(), row, row + len(messages) - 1)
+		for i, message in enumerate(messages, self.head + row):
+			self.entries[i % self.limit] = [message, None]
+		self.count += len(messages)
+		self.endInsertRows()
+
+
+class ChatListModel(QAbstractListModel):
+	"""
+	List model over a state's chat registry, updated one row at a time as chats are registered and removed.
+	Use `shared()` to get the single instance for a state, so that every view shares the same rows.
+	The Chat object of a row is available through `ChatRole`.
+	"""
+	ChatRole = Qt.UserRole
+	_shared = weakref.WeakKeyDictionary()
+
+	def __init__(self, registry, parent=None):
+		super().__init__(parent)
+		self.registry = registry
+		self.registry.listeners.append(self.on_registry_event)
+
+	@classmethod
+	def shared(cls, state):
+		if state not in cls._shared:
+			cls._shared[state] = cls(state.chats, state)
+		return cls._shared[state]
+
+	def rowCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self.registry)
+
+	def data(self, index, role=Qt.DisplayRole):
+		if not index.isValid():
+			return None
+		if role == Qt.DisplayRole:
+			return str(self.registry[index.row()])
+		if role == self.ChatRole:
+			return self.registry[index.row()]
+		return None
+
+	def on_registry_event(self, event, index):
+		if event == self.registry.ABOUT_TO_INSERT:
+			self.beginInsertRows(QModelIndex(), index, index)
+		elif event == self.registry.INSERTED:
+			self.endInsertRows()
+		elif event == self.registry.ABOUT_TO_REMOVE:
+			self.beginRemoveRows(QModelIndex(), index, index)
+		elif event == self.registry.REMOVED:
+			self.endRemoveRows()
+
+
+class UserTableModel(QAbstractTableModel):
+	"""
+	Lazily fetched table model over `user_info`. Rows are loaded in pages of `page_size` as the view scrolls,
+	using keyset pagination on rowid, and formatted on first display.
+	If a search prefix of at least `MIN_PREFIX_LENGTH` characters is set, only users with a nickname starting with it
+	(case-insensitively) are shown, in nickname order. Those pages are read in the order of the `user_nicknames` index
+	and continue after the last (nickname, user_id) pair, so every page costs the same however many users match.
+	A user with several matching nicknames is shown once, at the first of them.
+	"""
+	COLUMNS = ['ID', 'Nicknames', 'Created on', 'Extension data']
+	MIN_PREFIX_LENGTH = 2
+	QUERY = 'SELECT rowid, nicknames, created_on, extension_data FROM user_info WHERE rowid > ? ORDER BY rowid LIMIT ?'
+	SEARCH_QUERY = (
+		'SELECT u.rowid, u.nicknames, u.created_on, u.extension_data, n.nickname '
+		'FROM user_nicknames n JOIN user_info u ON u.rowid = n.user_id '
+		'WHERE n.nickname >= ? AND n.nickname < ? AND (n.nickname, n.user_id) > (?, ?) '
+		'ORDER BY n.nickname, n.user_id LIMIT ?'
+	)
+
+	def __init__(self, database, page_size=200, parent=None):
+		super().__init__(parent)
+		self.database = database
+		self.page_size = page_size
+		self.prefix = ''
+		self.rows = []
+		self.row_indices = {}
+		# Key of the last fetched row: a rowid, or a (nickname, user_id) pair while searching
+		self.last_key = None
+		self.exhausted = False
+
+	def rowCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self.rows)
+
+	def columnCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self.COLUMNS)
+
+	def headerData(self, section, orientation, role=Qt.DisplayRole):
+		if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+			return self.COLUMNS[section]
+		return None
+
+	def data(self, index, role=Qt.DisplayRole):
+		if role != Qt.DisplayRole or not index.isValid():
+			return None
+		row = self.rows[index.row()]
+		if row[1] is None:
+			row[1] = self.format_row(row[0])
+		return row[1][index.column()]
+
+	def flags(self, index):
+		return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+	@staticmethod
+	def format_row(row):
+		return (
+			str(row[0]),
+			str(json.loads(row[1])),
+			utils.timestamp_to_datetime(row[2]).strftime('%y-%m-%d %H:%M'),
+			str(json.loads(row[3]))
+		)
+
+	def query(self, after, limit):
+		"""
+		:return: up to `limit` rows after the given key, and the key of the last one
+		"""
+		if self.prefix:
+			nickname, user_id = after or ('', 0)
+			rows = self.database.cursor().execute(
+				self.SEARCH_QUERY, (self.prefix, self.prefix + '\U0010ffff', nickname, user_id, limit)
+			).fetchall()
+			return [row[:4] for row in rows], (rows[-1][4], rows[-1][0]) if rows else after
+		rows = self.database.cursor().execute(self.QUERY, (after or 0, limit)).fetchall()
+		return rows, rows[-1][0] if rows else after
+
+	def canFetchMore(self, parent=QModelIndex()):
+		return not parent.isValid() and not self.exhausted
+
+	def fetchMore(self, parent=QModelIndex()):
+		if parent.isValid() or self.exhausted:
+			return
+		page = []
+		while not page and not self.exhausted:
+			page, self.last_key = self.query(self.last_key, self.page_size)
+			self.exhausted = len(page) < self.page_size
+			# A user can match through several nicknames, on this page or an earlier one
+			seen = set()
+			page = [
+				row for row in page
+				if row[0] not in self.row_indices and row[0] not in seen and not seen.add(row[0])
+			]
+		if not page:
+			return
+		first = len(self.rows)
+		self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+		for i, row in enumerate(page, first):
+			self.rows.append([row, None])
+			self.row_indices[row[0]] = i
+		self.endInsertRows()
+
+	def set_prefix(self, prefix):
+		self.beginResetModel()
+		self.prefix = prefix if len(prefix) >= self.MIN_PREFIX_LENGTH else ''
+		self.rows = []
+		self.row_indices = {}
+		self.last_key = None
+		self.exhausted = False
+		self.endResetModel()
+
+	def update_rows(self, rowids):
+		"""
+		Re-fetch the given rows if they have been loaded. Rows that no longer exist are left as they are.
+		"""
+		rowids = [rowid for rowid in rowids if rowid in self.row_indices]
+		for start in range(0, len(rowids), 500):
+			chunk = rowids[start:start + 500]
+			for row in self.database.cursor().execute(
+				'SELECT rowid, nicknames, created_on, extension_data FROM user_info '
+				f'WHERE rowid IN ({", ".join("?" * len(chunk))})', chunk
+			):
+				index = self.row_indices[row[0]]
+				self.rows[index] = [row, None]
+				self.dataChanged.emit(self.index(index, 0), self.index(index, len(self.COLUMNS) - 1))
+
+	def rows_added(self):
+		"""
+		Make rows added after the last page was fetched available to the view.
+		"""
+		if self.exhausted:
+			self.exhausted = False
+			self.fetchMore()
@@ -5,6 +5,28 @@ from PySide2.QtWidgets import QWidget, QSplitter, QVBoxLayout, QApplication
 from .widgets import *
 
 
+class LazyTab(QWidget):
+	"""
+	Placeholder for a tab whose contents are built by `factory` the first time the tab is shown.
+	"""
+	def __init__(self, factory, parent=None):
+		super().__init__(parent)
+		self.factory = factory
+		self.widget = None
+		self.setLayout(QVBoxLayout())
+		self.layout().setContentsMargins(0, 0, 0, 0)
+
+	def showEvent(self, event):
+		self.build()
+		super().showEvent(event)
+
+	def build(self):
+		if self.widget is None:
+			self.widget = self.factory()
+			self.layout().addWidget(self.widget)
+		return self.widget
+
+
 class Dashboard(QWidget):
 	def __init__(self, state, parent=None):
 		super().__init__(parent)
@@ -63,7 +85,10 @@ class Extensions(QWidget):
 		)
 		self.setLayout(root_layout)
 
-		state.ready.connect(self.extension_list.initialize)
+		if state.start_time is None:
+			state.ready.connect(self.extension_list.initialize)
+		else:
+			self.extension_list.initialize()
 
 
 class About(QWidget):
@@ -1,81 +1,135 @@
 import asyncio
-import datetime
-import json
+import collections
+import html
 import logging
+import logging.handlers
+import queue
 
 
-from PySide2.QtCore import Qt, QTimer
+from PySide2.QtCore import Qt, QTimer, QStringListModel
 from PySide2.QtWidgets import (
-	QWidget, QHBoxLayout, QVBoxLayout, QTableWidget, QTableWidgetItem, QPlainTextEdit, QLineEdit, QListWidget,
-	QSizePolicy, QComboBox, QPushButton, QLabel, QStackedWidget, QAbstractItemView, QCheckBox, QTableView
+	QWidget, QHBoxLayout, QVBoxLayout, QPlainTextEdit, QLineEdit, QListWidget, QSizePolicy, QComboBox, QPushButton,
+	QLabel, QStackedWidget, QAbstractItemView, QCheckBox, QTableView, QHeaderView, QCompleter
 )
-from PySide2.QtGui import QTextOption, QStandardItemModel, QStandardItem
+from PySide2.QtGui import QTextOption
 
-import utils
+import config
+from .models import ChatListModel, ChatLogModel, UserTableModel
 
 
-class DashboardChatView(QTableWidget):
+class DashboardChatView(QTableView):
+	"""
+	Incoming messages are buffered and added to the model at most once every `FLUSH_INTERVAL_MS`, so that a burst
+	of messages causes a single layout pass. `coalesced_updates` counts the updates that were saved this way.
+	"""
+	FLUSH_INTERVAL_MS = 16
+
 	def __init__(self, state, parent=None):
-		super().__init__(0, 4, parent)
-		self.setHorizontalHeaderLabels(['Time', 'Chat', 'Author', 'Message'])
+		super().__init__(parent)
+		self.chatLogModel = ChatLogModel(config.CHAT_LOG_LIMIT, self)
+		self.flushTimer = QTimer()
+		self.pending_messages = []
+		self.coalesced_updates = 0
+		self.setModel(self.chatLogModel)
 		self.verticalHeader().hide()
+		self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+		self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 6)
+		self.horizontalHeader().setStretchLastSection(True)
 		self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
 		self.setWordWrap(False)
 		for i in range(3):
 			self.horizontalHeader().resizeSection(i, self.horizontalHeader().sectionSizeHint(i) + 20)
+		self.setMinimumWidth(sum(self.horizontalHeader().sectionSize(i) for i in range(3)))
+		self.flushTimer.setSingleShot(True)
+		self.flushTimer.timeout.connect(self.flush)
 		state.anyMessageReceived.connect(self.add_message)
 
-	def viewportEvent(self, event):
-		# Set the width of the last section to fill the available space, unless that is smaller than its contents,
-		# in which case the section will be as wide as needed to display everything.
-		# https://stackoverflow.com/a/47834343/4434353
-		self.resizeRowsToContents()
-		minimum_width = sum(self.horizontalHeader().sectionSize(i) for i in range(3))
-		self.setMinimumWidth(minimum_width)
-		self.horizontalHeader().resizeSection(3, max(
-			self.sizeHintForColumn(3),
-			self.viewport().size().width() - minimum_width)
-		)
-		return super().viewportEvent(event)
+	def is_scrolled_to_bottom(self):
+		return self.verticalScrollBar().value() == self.verticalScrollBar().maximum()
 
 	def add_message(self, message):
-		index = self.rowCount()
-		self.insertRow(index)
-		self.setItem(index, 0, QTableWidgetItem(datetime.datetime.fromtimestamp(message.timestamp).strftime('%H:%M')))
-		self.setItem(index, 1, QTableWidgetItem(str(message.source)))
-		self.setItem(index, 2, QTableWidgetItem(str(message.author)))
-		self.setItem(index, 3, QTableWidgetItem(str(message.content)))
-		for i in range(4):
-			self.item(index, i).setFlags(~Qt.ItemIsEditable)
-		self.resizeColumnToContents(3)
-		self.updateGeometry()
+		self.pending_messages.append(message)
+		if not self.flushTimer.isActive():
+			self.flushTimer.start(self.FLUSH_INTERVAL_MS)
+
+	def flush(self):
+		if not self.pending_messages:
+			return
+		messages, self.pending_messages = self.pending_messages, []
+		self.coalesced_updates += len(messages) - 1
+		scroll = self.is_scrolled_to_bottom()
+		self.chatLogModel.extend(messages)
+		if scroll:
+			self.scrollToBottom()
+		self.setToolTip(f'{self.coalesced_updates} message updates coalesced')
 
 
 class DashboardMessageSender(QWidget):
+	"""
+	The chat selector shares the state's ChatListModel and can be filtered by typing part of a chat's name.
+	Typing "@" followed by the start of a nickname offers up to `COMPLETION_LIMIT` matching nicknames from the state's
+	nickname index.
+	"""
+	COMPLETION_LIMIT = 10
+
 	def __init__(self, state, parent=None):
 		super().__init__(parent)
 		self.state = state
 		self.comboBox = QComboBox()
+		self.comboBox.setModel(ChatListModel.shared(state))
+		self.comboBox.setEditable(True)
+		self.comboBox.setInsertPolicy(QComboBox.NoInsert)
+		self.comboBox.completer().setCompletionMode(QCompleter.PopupCompletion)
+		self.comboBox.completer().setFilterMode(Qt.MatchContains)
+		self.comboBox.completer().setCaseSensitivity(Qt.CaseInsensitive)
 		self.lineEdit = QLineEdit()
+		self.completerModel = QStringListModel(self)
+		self.completer = QCompleter(self.completerModel, self)
+		self.completer.setWidget(self.lineEdit)
+		self.completer.setCaseSensitivity(Qt.CaseInsensitive)
+		self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
 
-		self.state.chatAdded.connect(self.update_chat_list)
 		self.lineEdit.returnPressed.connect(self.send)
+		self.lineEdit.textEdited.connect(self.update_completions)
+		self.completer.activated[str].connect(self.insert_mention)
 		layout = QHBoxLayout()
 		layout.setContentsMargins(0, layout.contentsMargins().top(), 0, layout.contentsMargins().bottom())
 		layout.addWidget(self.comboBox)
 		layout.addWidget(self.lineEdit)
 		self.setLayout(layout)
 
-	def update_chat_list(self):
-		self.comboBox.model().clear()
-		self.comboBox.addItems(str(chat) for chat in self.state.chats)
-
 	def selected_chat(self):
-		return self.state.chats[self.comboBox.currentIndex()]
+		return self.comboBox.currentData(ChatListModel.ChatRole)
+
+	def mention_prefix(self):
+		"""
+		:return: the partial nickname after "@" in the word before the cursor, or None if it isn't a mention
+		"""
+		text = self.lineEdit.text()[:self.lineEdit.cursorPosition()]
+		word = text.rsplit(None, 1)[-1] if text and not text[-1].isspace() else ''
+		return word[1:] if word.startswith('@') else None
+
+	def update_completions(self):
+		prefix = self.mention_prefix()
+		nicknames = []
+		if prefix and self.state.nickname_index is not None:
+			nicknames = [nickname for nickname, _ in self.state.nickname_index.search(prefix, self.COMPLETION_LIMIT)]
+		self.completerModel.setStringList(nicknames)
+		if nicknames:
+			self.completer.complete()
+		else:
+			self.completer.popup().hide()
+
+	def insert_mention(self, nickname):
+		text = self.lineEdit.text()
+		end = self.lineEdit.cursorPosition()
+		start = end - len(self.mention_prefix() or '')
+		self.lineEdit.setText(f'{text[:start]}{nickname} {text[end:]}')
+		self.lineEdit.setCursorPosition(start + len(nickname) + 1)
 
 	def send(self):
-		if content := self.lineEdit.text():
-			asyncio.get_event_loop().create_task(self.selected_chat().send(content))
+		if (content := self.lineEdit.text()) and (chat := self.selected_chat()) is not None:
+			asyncio.get_event_loop().create_task(chat.send(content))
 			self.lineEdit.setText('')
 
 
@@ -138,24 +192,26 @@ class DashboardCustomWidgetManager(QWidget):
 
 
 class DashboardStatusWidget(QWidget):
-	class Handler(logging.Handler):
-		def __init__(self, widget):
-			super().__init__()
-			self.widget = widget
-			self.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M'))
-
-		def emit(self, record):
-			self.widget.records.append(record)
-			if self.widget.should_display_record(record):
-				self.widget.add_message(self.format(record))
+	"""
+	Records reach this widget through a sink of the state's log pipeline, which formats them on the listener thread
+	and puts them into `logQueue`. The queue is emptied on the GUI thread every `LOG_DRAIN_INTERVAL_MS`, so it can't
+	grow without bound under heavy logging; only the newest records that fit in the text box are rendered.
+	"""
+	LOG_DRAIN_INTERVAL_MS = 100
 
 	def __init__(self, state, parent=None):
 		super().__init__(parent)
 		self.state = state
 		self.log_level_indices = {logging.DEBUG: 0, logging.INFO: 1, logging.WARNING: 2}
-		self.records = []
-		self.handler = DashboardStatusWidget.Handler(self)
-		self.state.logger.addHandler(self.handler)
+		# One ring of formatted records per entry in the level selector, holding the records that it displays
+		self.records = [collections.deque(maxlen=config.STATUS_LOG_LIMIT) for _ in self.log_level_indices]
+		self.logQueue = queue.SimpleQueue()
+		self.handler = logging.handlers.QueueHandler(self.logQueue)
+		self.handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M'))
+		self.state.log_pipeline.add_sink(self.handler)
+		self.logTimer = QTimer()
+		self.logTimer.timeout.connect(self.drain_log)
+		self.logTimer.start(self.LOG_DRAIN_INTERVAL_MS)
 
 		self.plainTextEdit = QPlainTextEdit()
 		self.logLevelSelector = QComboBox()
@@ -193,6 +249,7 @@ class DashboardStatusWidget(QWidget):
 		self.logLevelSelector.setCurrentIndex(self.log_level_indices[logging.INFO])
 		self.logLevelSelector.currentIndexChanged.connect(self.update_log_level)
 		self.plainTextEdit.setReadOnly(True)
+		self.plainTextEdit.setMaximumBlockCount(config.STATUS_LOG_LIMIT)
 		self.plainTextEdit.setWordWrapMode(QTextOption.NoWrap)
 		self.wordWrapCheckbox.stateChanged.connect(lambda s: self.plainTextEdit.setWordWrapMode(
 			QTextOption.WrapAtWordBoundaryOrAnywhere if s == 2 else QTextOption.NoWrap
@@ -205,14 +262,29 @@ class DashboardStatusWidget(QWidget):
 	def should_display_record(self, record):
 		return self.log_level_indices.get(record.levelno, 3) >= self.logLevelSelector.currentIndex()
 
+	def drain_log(self):
+		displayed = collections.deque(maxlen=config.STATUS_LOG_LIMIT)
+		while True:
+			try:
+				record = self.logQueue.get_nowait()
+			except queue.Empty:
+				break
+			# QueueHandler replaces the message with the formatted record
+			for index in range(min(self.log_level_indices.get(record.levelno, 3) + 1, len(self.records))):
+				self.records[index].append(record.msg)
+			if self.should_display_record(record):
+				displayed.append(record.msg)
+		if displayed:
+			self.add_message('\n'.join(displayed))
+
 	def update_log_level(self):
 		self.plainTextEdit.horizontalScrollBar().setValue(0)
-		self.plainTextEdit.setPlainText('\n'.join(
-			self.handler.format(record) for record in self.records if self.should_display_record(record)
-		))
+		self.plainTextEdit.setPlainText('\n'.join(self.records[self.logLevelSelector.currentIndex()]))
 
 	def update_status(self):
-		self.statusLabel.setText(self.uptime_text())
+		self.statusLabel.setText(
+			f'{self.uptime_text()}\n{self.state.watchdog.lag_text()}\n{self.state.db_maintenance.status_text()}'
+		)
 
 	def uptime_text(self):
 		seconds = self.state.uptime.seconds
@@ -244,28 +316,35 @@ class DashboardShortcutWidget(QWidget):
 
 
 class DatabaseEditor(QWidget):
-	COLUMNS = ['ID', 'Nicknames', 'Created on', 'Extension data']
-	UPDATE_INTERVAL_MS = 4000
+	"""
+	Users are loaded page by page as the table is scrolled. Loaded rows are re-fetched, and new rows made available,
+	when the state's `usersChanged` signal reports changes to them. While the editor is hidden, changes are only
+	collected and applied once it is shown again.
+	Searching is debounced by `SEARCH_DELAY_MS` and matches nickname prefixes through an index.
+	"""
+	SEARCH_DELAY_MS = 300
 
 	def __init__(self, state, parent=None):
 		super().__init__(parent)
-		self.display_limit = 100
-		self.use_search_bar = False
+		self.state = state
 		self.db_wrapper = state.database
-		self.db_cursor = state.database.cursor()
+		self.pending_changed = set()
+		self.pending_added = False
 		self.searchBar = QLineEdit()
 		self.mainTableView = QTableView()
-		self.mainTableModel = QStandardItemModel(0, len(self.COLUMNS))
-		self.updateTimer = QTimer()
+		self.mainTableModel = UserTableModel(self.db_wrapper, parent=self)
+		self.searchTimer = QTimer()
 
-		self.mainTableModel.setHorizontalHeaderLabels(self.COLUMNS)
+		self.mainTableView.setModel(self.mainTableModel)
 		self.mainTableView.horizontalHeader().setStretchLastSection(True)
 		self.mainTableView.setWordWrap(False)
 		self.mainTableView.verticalHeader().setVisible(False)
+		self.mainTableView.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
 		self.mainTableView.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
 		self.searchBar.textEdited.connect(self.onSearchBarTextEdited)
-		self.updateTimer.timeout.connect(self.update_data)
-		self.updateTimer.start(self.UPDATE_INTERVAL_MS)
+		self.searchTimer.setSingleShot(True)
+		self.searchTimer.timeout.connect(self.update_search)
+		self.state.usersChanged.connect(self.update_data)
 
 		rootLayout = QVBoxLayout()
 		topLayout = QHBoxLayout()
@@ -276,39 +355,32 @@ class DatabaseEditor(QWidget):
 		rootLayout.addWidget(topWidget)
 		rootLayout.addWidget(self.mainTableView)
 		self.setLayout(rootLayout)
-		self.update_data()
+		self.mainTableModel.fetchMore()
 		self.mainTableView.resizeColumnsToContents()
 
 	def onSearchBarTextEdited(self):
-		self.use_search_bar = (len(self.searchBar.text()) > 1)
-		if self.use_search_bar:
-			self.updateTimer.stop()
-		else:
-			self.updateTimer.start(self.UPDATE_INTERVAL_MS)
-		self.update_data()
+		self.searchTimer.start(self.SEARCH_DELAY_MS)
 
-	def update_data(self):
-		self.mainTableModel.setRowCount(0)
-		if self.use_search_bar:
-			self.db_cursor.execute(
-				'SELECT rowid, nicknames, created_on, extension_data '
-				'FROM user_info WHERE nicknames LIKE ? ORDER BY rowid ASC',
-				(f'%{self.searchBar.text()}%',)
-			)
-		else:
-			self.db_cursor.execute(
-				'SELECT rowid, nicknames, created_on, extension_data '
-				'FROM user_info ORDER BY rowid ASC LIMIT ?',
-				(self.display_limit,)
-			)
-		for row in self.db_cursor.fetchall():
-			self.mainTableModel.appendRow([
-				QStandardItem(str(row[0])),
-				QStandardItem(str(json.loads(row[1]))),
-				QStandardItem(utils.timestamp_to_datetime(row[2]).strftime('%y-%m-%d %H:%M')),
-				QStandardItem(str(json.loads(row[3])))
-			])
-		self.mainTableView.setModel(self.mainTableModel)
+	def update_search(self):
+		self.mainTableModel.set_prefix(self.searchBar.text().strip())
+
+	def showEvent(self, event):
+		self.apply_pending_changes()
+		super().showEvent(event)
+
+	def update_data(self, changes):
+		self.pending_changed |= changes.changed
+		self.pending_added = self.pending_added or bool(changes.added)
+		if self.isVisible():
+			self.apply_pending_changes()
+
+	def apply_pending_changes(self):
+		if self.pending_changed:
+			self.mainTableModel.update_rows(self.pending_changed)
+			self.pending_changed = set()
+		if self.pending_added:
+			self.mainTableModel.rows_added()
+			self.pending_added = False
 
 
 class ExtensionList(QListWidget):
@@ -323,24 +395,51 @@ class ExtensionList(QListWidget):
 
 
 class ExtensionViewer(QWidget):
+	STATS_UPDATE_INTERVAL_MS = 1000
+
 	def __init__(self, state, parent=None):
 		super().__init__(parent)
 		self.state = state
 		self.extension = None
 		self.label = QLabel()
+		self.statsLabel = QLabel()
+		self.exportButton = QPushButton('Export profiling snapshot')
+		self.statsTimer = QTimer()
 		self.label.setWordWrap(True)
 		self.label.setAlignment(Qt.AlignTop)
-		layout = QHBoxLayout()
+		self.statsLabel.setAlignment(Qt.AlignTop)
+		self.statsLabel.setTextFormat(Qt.RichText)
+		self.exportButton.setFixedWidth(self.exportButton.sizeHint().width())
+		self.exportButton.clicked.connect(self.export_snapshot)
+		self.statsTimer.timeout.connect(self.update_stats)
+		layout = QVBoxLayout()
 		layout.addWidget(self.label)
+		layout.addWidget(self.statsLabel)
+		layout.addWidget(self.exportButton)
+		layout.setStretch(1, 1)
 		layout.setMargin(0)
 		self.setLayout(layout)
 
+	def showEvent(self, event):
+		if self.extension is not None:
+			self.statsTimer.start(self.STATS_UPDATE_INTERVAL_MS)
+		super().showEvent(event)
+
+	def hideEvent(self, event):
+		self.statsTimer.stop()
+		super().hideEvent(event)
+
 	def disable(self):
+		self.extension = None
+		self.statsTimer.stop()
 		self.label.setText('')
+		self.statsLabel.setText('')
 
 	def show_extension(self, extension):
 		self.extension = extension
 		self.update_data()
+		if self.isVisible():
+			self.statsTimer.start(self.STATS_UPDATE_INTERVAL_MS)
 
 	def update_data(self):
 		self.label.setText(
@@ -351,3 +450,23 @@ class ExtensionViewer(QWidget):
 			f'{self.extension.summary}\n\n'
 			f'{self.extension.description}'
 		)
+		self.update_stats()
+
+	def update_stats(self):
+		stats = self.extension.stats
+		rows = ''.join(
+			f'<tr><td>{html.escape(key)}</td><td>{h.calls}</td><td>{h.total_time * 1000:.1f}</td>'
+			f'<td>{h.max_time * 1000:.1f}</td><td>{h.blocking_time * 1000:.1f}</td>'
+			f'<td>{h.max_blocking_time * 1000:.1f}</td><td>{h.exceptions}</td></tr>'
+			for key, h in stats.handlers.items()
+		)
+		self.statsLabel.setText(
+			f'<b>Handlers</b>: {stats.calls} calls, {stats.total_time * 1000:.1f} ms total, '
+			f'{stats.blocking_time * 1000:.1f} ms blocking, {stats.exceptions} exceptions'
+			f'<table cellspacing="4"><tr><th>Handler</th><th>Calls</th><th>Total ms</th><th>Max ms</th>'
+			f'<th>Blocking ms</th><th>Max blocking ms</th><th>Exceptions</th></tr>{rows}</table>'
+		)
+
+	def export_snapshot(self):
+		path = self.state.export_profiling_snapshot()
+		self.state.logger.info(f'Exported profiling snapshot to "{path}"')
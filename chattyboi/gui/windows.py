@@ -1,59 +1,154 @@
 # SPDX-License-Identifier: Apache-2.0
+import asyncio
+import json
+import os
 import pathlib
-from typing import List, Union
+import threading
+from typing import Dict, List, Tuple, Union
 
-from PySide2.QtCore import QStringListModel
+from PySide2.QtCore import Qt
+from PySide2.QtGui import QStandardItem, QStandardItemModel
 from PySide2.QtWidgets import (
 	QWidget, QHBoxLayout, QVBoxLayout, QMainWindow, QDialog, QListView, QPushButton, QTabWidget, QSizePolicy
 )
 
-import profiles
-from . import tabs
+import classes
+import config
 
 
 class ProfileSelectDialog(QDialog):
+	"""
+	The list is filled from a cached index of known profiles (path, name and modification time of the properties
+	file), stored in the user settings, so that the dialog opens without touching every profile. A background thread
+	then scans the search paths, reading the names of new or modified profiles, and updates the list and the index
+	as results arrive.
+	"""
+	INDEX_SETTING = 'profile index'
+	PathRole = Qt.UserRole + 1
+
 	def __init__(self, search_paths: List[Union[str, pathlib.Path]], *args, **kwargs):
 		super().__init__(*args, **kwargs)
 		self.setLayout(QVBoxLayout())
 		self.profileListView = QListView()
-		self.profileListModel = QStringListModel()
+		self.profileListModel = QStandardItemModel()
 		self.cancel_button = QPushButton('Cancel')
 		self.confirm_button = QPushButton('Confirm')
-		self.profile_paths = [
-			pathlib.Path(profile)
-			for parent in search_paths
-			for profile in pathlib.Path(parent).glob('*')
-			if (profile / 'profile.json').is_file()
-		]
-
-		self.profileListModel.setStringList([profiles.Profile(path).name for path in self.profile_paths])
+		self.search_paths = [pathlib.Path(path).resolve() for path in search_paths]
+		self.index = self.load_index()
+		self.items = {}
+
+		for path, (name, mtime) in sorted(self.index.items(), key=lambda entry: entry[1][0]):
+			if pathlib.Path(path).parent in self.search_paths:
+				self.update_profile(path, name, mtime)
 		self.profileListView.setModel(self.profileListModel)
 		self.profileListView.setSelectionMode(QListView.SingleSelection)
+		self.profileListView.setEditTriggers(QListView.NoEditTriggers)
 		self.layout().addWidget(self.profileListView)
 		self.layout().addWidget(self.confirm_button)
 		self.layout().addWidget(self.cancel_button)
 		self.cancel_button.clicked.connect(self.reject)
 		self.confirm_button.clicked.connect(self.accept)
+		self.confirm_button.setEnabled(False)
+		self.profileListView.selectionModel().selectionChanged.connect(self.update_confirm_button)
+		self.profileListModel.rowsRemoved.connect(self.update_confirm_button)
 		self.setWindowTitle('Select Profile')
 		self.resize(350, 300)
 
+		loop = asyncio.get_event_loop()
+		threading.Thread(
+			target=self.scan, args=(loop, self.search_paths, dict(self.index)), name='Profile scan', daemon=True
+		).start()
+
+	@classmethod
+	def load_index(cls) -> Dict[str, Tuple[str, float]]:
+		try:
+			entries = json.loads(config.user_settings.value(cls.INDEX_SETTING))
+			return {path: (name, mtime) for path, name, mtime in entries}
+		except (TypeError, ValueError):
+			return {}
+
+	def save_index(self):
+		config.user_settings.setValue(
+			self.INDEX_SETTING, json.dumps([[path, name, mtime] for path, (name, mtime) in self.index.items()])
+		)
+
+	def scan(self, loop, search_paths, index):
+		"""
+		Runs in a separate thread and reports each profile found to the dialog through the event loop.
+		"""
+		found = set()
+		for parent in search_paths:
+			try:
+				candidates = [entry for entry in os.scandir(parent) if entry.is_dir()]
+			except OSError:
+				continue
+			for entry in candidates:
+				try:
+					mtime = (pathlib.Path(entry.path) / classes.Profile.PROPERTIES_FILENAME).stat().st_mtime
+				except OSError:
+					continue
+				path = str(pathlib.Path(entry.path).resolve())
+				cached = index.get(path)
+				if cached is not None and cached[1] == mtime:
+					name = cached[0]
+				else:
+					try:
+						name = classes.Profile.read_name(pathlib.Path(path))
+					except (OSError, ValueError):
+						continue
+				found.add(path)
+				loop.call_soon_threadsafe(self.update_profile, path, name, mtime)
+		loop.call_soon_threadsafe(self.finish_scan, found)
+
+	def update_profile(self, path, name, mtime):
+		self.index[path] = (name, mtime)
+		if path in self.items:
+			self.items[path].setText(name)
+		else:
+			item = QStandardItem(name)
+			item.setData(path, self.PathRole)
+			self.profileListModel.appendRow(item)
+			self.items[path] = item
+
+	def finish_scan(self, found):
+		for path in [path for path in self.items if path not in found]:
+			self.profileListModel.removeRow(self.items.pop(path).row())
+		for path in [path for path in self.index if path not in found]:
+			if pathlib.Path(path).parent in self.search_paths:
+				del self.index[path]
+		self.save_index()
+
+	def has_selection(self):
+		return bool(self.profileListView.selectionModel().selectedIndexes())
+
+	def update_confirm_button(self):
+		self.confirm_button.setEnabled(self.has_selection())
+
+	def accept(self):
+		# Double-clicking or pressing Enter can accept the dialog even while the button is disabled
+		if self.has_selection():
+			super().accept()
+
 	def get_selected_path(self) -> pathlib.Path:
-		return self.profile_paths[self.profileListView.currentIndex().row()]
+		index = self.profileListView.selectionModel().selectedIndexes()[0]
+		return pathlib.Path(self.profileListModel.itemFromIndex(index).data(self.PathRole))
 
 
 class MainWindow(QMainWindow):
 	def __init__(self, state, *args, **kwargs):
 		super().__init__(*args, **kwargs)
+		from . import tabs
 		self.tabWidget = QTabWidget()
+		# Only the dashboard is built upfront; the other tabs are built the first time they are opened
 		self.dashboardTab = tabs.Dashboard(state)
-		self.databaseTab = tabs.Database(state)
-		self.extensionsTab = tabs.Extensions(state)
-		self.aboutTab = tabs.About(state)
+		self.databaseTab = tabs.LazyTab(lambda: tabs.Database(state))
+		self.extensionsTab = tabs.LazyTab(lambda: tabs.Extensions(state))
+		self.aboutTab = tabs.LazyTab(lambda: tabs.About(state))
 		self.tabWidget.addTab(self.dashboardTab, 'Dashboard')
 		self.tabWidget.addTab(self.databaseTab, 'Database')
 		self.tabWidget.addTab(self.extensionsTab, 'Extensions')
 		self.tabWidget.addTab(self.aboutTab, 'About')
 		self.setCentralWidget(self.tabWidget)
-		self.setWindowTitle('ChattyBoi')
+		self.setWindowTitle(f'ChattyBoi - {state.profile.name}')
 		self.setMinimumSize(400, 200)
 		self.resize(700, 500)
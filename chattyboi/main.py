@@ -1,8 +1,10 @@
 # SPDX-License-Identifier: Apache-2.0
 import sys
 
-import utils, config, profiles, gui, state, chattyboi, extapi
+import startup
 
 
 if __name__ == '__main__':
+	with startup.phase('imports'):
+		import chattyboi
 	sys.exit(chattyboi.run_default())
@@ -1,5 +1,21 @@
+-- auto_vacuum only takes effect for new databases; DatabaseMaintenance converts existing ones
+PRAGMA auto_vacuum = INCREMENTAL;
+-- journal_mode is persistent and switches existing databases to WAL as well
+PRAGMA journal_mode = WAL;
 CREATE TABLE IF NOT EXISTS user_info (
     nicknames TEXT NOT NULL,
     created_on FLOAT NOT NULL,
     extension_data TEXT
-);
\ No newline at end of file
+);
+CREATE TABLE IF NOT EXISTS user_nicknames (
+    nickname TEXT NOT NULL COLLATE NOCASE,
+    user_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS user_nicknames_nickname ON user_nicknames (nickname, user_id);
+CREATE INDEX IF NOT EXISTS user_nicknames_user_id ON user_nicknames (user_id);
+CREATE TABLE IF NOT EXISTS extension_kv (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
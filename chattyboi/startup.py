@@ -0,0 +1,56 @@
+"""
+Use this module to record how long each phase of startup takes.
+Offsets are measured from the moment this module was first imported, which should be as early as possible.
+Pass `TRACE_FLAG` on the command line to print the timeline once ChattyBoi is ready.
+"""
+import contextlib
+import sys
+import time
+from typing import List, Tuple
+
+TRACE_FLAG = '--startup-trace'
+
+_origin = time.perf_counter()
+phases: List[Tuple[str, float, float]] = []
+_depth = 0
+
+
+@contextlib.contextmanager
+def phase(name: str):
+	"""
+	Record the duration of the enclosed block. Phases can be nested.
+	"""
+	global _depth
+	start = time.perf_counter()
+	index = len(phases)
+	phases.append(('  ' * _depth + name, start - _origin, 0.0))
+	_depth += 1
+	try:
+		yield
+	finally:
+		_depth -= 1
+		phases[index] = (phases[index][0], phases[index][1], time.perf_counter() - start)
+
+
+def mark(name: str):
+	"""
+	Record a point in time without a duration.
+	"""
+	phases.append(('  ' * _depth + name, time.perf_counter() - _origin, 0.0))
+
+
+def report() -> str:
+	return 'Startup timeline:\n' + '\n'.join(
+		f'{offset * 1000:9.1f} ms  {name}' + (f' ({duration * 1000:.1f} ms)' if duration else '')
+		for name, offset, duration in phases
+	)
+
+
+def finish(logger):
+	"""
+	Mark the end of startup, log the timeline at debug level, and print it if `TRACE_FLAG` was passed.
+	"""
+	mark('ready')
+	logger.debug(report())
+	if TRACE_FLAG in sys.argv:
+		print(report(), file=sys.stderr)
@@ -1,7 +1,56 @@
 """
 Use this module to keep track of the global state.
+`state` is the first ApplicationState that was created. When several profiles run in one process, each has its own
+ApplicationState in `states`, and `get()` returns the one that the running code belongs to: ChattyBoi sets `current`
+while it loads an extension and while it runs event handlers and scheduled jobs, and tasks inherit it from there.
+Outside of those contexts, e.g. in Qt slots, timers and threads that an extension sets up itself, the state is found
+through the extension module that the code belongs to, which `extensions` maps to its Extension.
 """
 from __future__ import annotations
+
+import contextlib
+import contextvars
+from typing import Dict, List, Optional
+
 import chattyboi
 
 state: chattyboi.ApplicationState = None
+states: List[chattyboi.ApplicationState] = []
+current: contextvars.ContextVar[chattyboi.ApplicationState] = contextvars.ContextVar('current_state')
+# Top-level extension module name -> Extension, for the extensions of all states
+extensions: Dict[str, chattyboi.Extension] = {}
+
+
+def for_module(name: str) -> Optional[chattyboi.ApplicationState]:
+	"""
+	:return: The state of the extension that the module (or package) with the given name belongs to, if any
+	"""
+	extension = extensions.get(name.split('.', 1)[0])
+	return extension.state if extension is not None else None
+
+
+def get() -> chattyboi.ApplicationState:
+	"""
+	:return: The state of the profile that the running code belongs to, or `state` if only one profile is running
+	:raise RuntimeError: if several profiles are running and the code runs outside of all of their contexts
+	"""
+	app_state = current.get(None)
+	if app_state is not None:
+		return app_state
+	if len(states) > 1:
+		raise RuntimeError(
+			'Several profiles are running and the current one is unknown here; use state.use() to select one'
+		)
+	return state
+
+
+@contextlib.contextmanager
+def use(app_state: chattyboi.ApplicationState):
+	"""
+	Make `get()` return the given state within the enclosed block and in tasks created in it.
+	"""
+	token = current.set(app_state)
+	try:
+		yield app_state
+	finally:
+		current.reset(token)
@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: Apache-2.0
+"""
+Measure the per-message cost of dispatching received messages to extension handlers: through the event bus, as
+ChattyBoi does now, and through the former chain of Qt signals (Chat.messageReceived -> anyMessageReceived ->
+one asyncSlot per handler) on a qasync loop. Times include running the (empty) handlers to completion.
+Usage: python benchmark_dispatch.py [messages] [handlers]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'chattyboi'))
+
+
+async def handler(message):
+	pass
+
+
+async def dispatch(publish, messages):
+	start = time.perf_counter()
+	for i in range(messages):
+		publish(i)
+		if i % 100 == 99:
+			# Let the handler tasks run, as they would between incoming messages
+			await asyncio.sleep(0)
+	await asyncio.sleep(0)
+	return time.perf_counter() - start
+
+
+def benchmark_bus(messages, handlers):
+	from classes import EventBus
+	bus = EventBus()
+	for _ in range(handlers):
+		bus.subscribe(EventBus.MESSAGE_RECEIVED, handler)
+	return asyncio.new_event_loop().run_until_complete(
+		dispatch(lambda message: bus.publish(EventBus.MESSAGE_RECEIVED, message), messages)
+	)
+
+
+def benchmark_qt(messages, handlers):
+	import qasync
+	from PySide2.QtCore import QObject, Signal
+	from PySide2.QtWidgets import QApplication
+
+	class Emitter(QObject):
+		messageReceived = Signal(object)
+
+	chat, state = Emitter(), Emitter()
+	chat.messageReceived.connect(state.messageReceived)
+	for _ in range(handlers):
+		state.messageReceived.connect(qasync.asyncSlot(object)(handler))
+	loop = qasync.QEventLoop(QApplication.instance() or QApplication(sys.argv))
+	asyncio.set_event_loop(loop)
+	with loop:
+		return loop.run_until_complete(dispatch(chat.messageReceived.emit, messages))
+
+
+def main():
+	messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	handlers = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+	import chattyboi  # noqa: F401 (classes must be imported through chattyboi)
+	print(f'{messages} messages, {handlers} handlers')
+	for name, benchmark in (('event bus', benchmark_bus), ('Qt signals', benchmark_qt)):
+		elapsed = benchmark(messages, handlers)
+		print(f'{name + ":":12} {elapsed * 1e6 / messages:8.2f} us/message')
+
+
+if __name__ == '__main__':
+	main()
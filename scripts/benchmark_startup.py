@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: Apache-2.0
+"""
+Measure ChattyBoi's cold-start time: importing the application and creating the QApplication and the profile dialog,
+each in a fresh interpreter. Prints the median and the best of several runs, in milliseconds.
+Usage: python benchmark_startup.py [runs] [path to the chattyboi source directory]
+"""
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SNIPPET = '''
+import sys, time
+start = time.perf_counter()
+import startup
+with startup.phase('imports'):
+	import chattyboi
+imported = time.perf_counter()
+import asyncio, qasync, gui
+from PySide2.QtWidgets import QApplication
+app = QApplication(sys.argv)
+asyncio.set_event_loop(qasync.QEventLoop(app))
+dialog = gui.ProfileSelectDialog(['./profiles'])
+shown = time.perf_counter()
+print((imported - start) * 1000, (shown - start) * 1000)
+'''
+
+
+def main():
+	runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+	source = Path(sys.argv[2] if len(sys.argv) > 2 else Path(__file__).parent.parent / 'chattyboi').resolve()
+	environment = {**os.environ, 'QT_QPA_PLATFORM': os.environ.get('QT_QPA_PLATFORM', 'offscreen')}
+	imports, dialogs = [], []
+	for _ in range(runs):
+		output = subprocess.run(
+			[sys.executable, '-c', SNIPPET], cwd=source, env=environment, capture_output=True, text=True, check=True
+		).stdout.split()
+		imports.append(float(output[0]))
+		dialogs.append(float(output[1]))
+	print(f'{runs} runs')
+	print(f'import:         median {statistics.median(imports):8.1f} ms, best {min(imports):8.1f} ms')
+	print(f'profile dialog: median {statistics.median(dialogs):8.1f} ms, best {min(dialogs):8.1f} ms')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,60 @@
+# SPDX-License-Identifier: Apache-2.0
+"""
+Import users from another bot's CSV or JSON Lines export into a ChattyBoi profile. ChattyBoi must not be running
+with the same profile.
+Usage: python import_users.py PROFILE FILE --nickname COLUMN [--nickname COLUMN ...]
+	[--data EXTENSION_HASH.KEY=COLUMN[:int|float] ...] [--merge] [--batch-size N]
+Example: python import_users.py profiles/main deepbot.csv --nickname user --data 1a2b3c.points=points:int
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'chattyboi'))
+
+CONVERTERS = {'int': int, 'float': float, 'str': str}
+
+
+def parse_data_column(argument):
+	target, _, column = argument.partition('=')
+	extension, _, key = target.partition('.')
+	column, _, type_name = column.partition(':')
+	if not (extension and key and column) or (type_name and type_name not in CONVERTERS):
+		raise argparse.ArgumentTypeError(f'expected EXTENSION_HASH.KEY=COLUMN[:int|float], got "{argument}"')
+	return extension, key, column, CONVERTERS.get(type_name)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Import users into a ChattyBoi profile.')
+	parser.add_argument('profile', type=Path)
+	parser.add_argument('file', type=Path)
+	parser.add_argument('--nickname', action='append', required=True, help='column with nicknames, preferred first')
+	parser.add_argument('--data', action='append', type=parse_data_column, default=[])
+	parser.add_argument('--merge', action='store_true', help='merge rows with existing nicknames instead of skipping')
+	parser.add_argument('--batch-size', type=int, default=50000)
+	args = parser.parse_args()
+
+	import chattyboi  # noqa: F401 (classes must be imported through chattyboi)
+	from classes import Profile, UserImporter, read_rows
+
+	data_columns, converters = {}, {}
+	for extension, key, column, converter in args.data:
+		data_columns.setdefault(extension, {})[key] = column
+		if converter:
+			converters[column] = converter
+	profile = Profile(args.profile)
+	profile.initialize()
+	importer = UserImporter(
+		profile.db_connection, args.nickname, data_columns, converters,
+		UserImporter.MERGE if args.merge else UserImporter.SKIP, args.batch_size, defer_indexes=True
+	)
+	try:
+		status = asyncio.run(importer.run(read_rows(args.file), lambda s: print(s, end='\r', file=sys.stderr)))
+	finally:
+		profile.cleanup()
+	print(f'\nFinished in {status.elapsed:.1f}s: {status}')
+
+
+if __name__ == '__main__':
+	main()
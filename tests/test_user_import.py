@@ -0,0 +1,50 @@
+# SPDX-License-Identifier: Apache-2.0
+import asyncio
+import json
+import sqlite3
+import sys
+import unittest
+from pathlib import Path
+
+CHATTYBOI_PATH = Path(__file__).resolve().parent.parent / 'chattyboi'
+sys.path.insert(0, str(CHATTYBOI_PATH))
+
+import chattyboi  # noqa: E402,F401 (classes must be imported through chattyboi)
+from classes import DatabaseWrapper, UserImporter  # noqa: E402
+
+
+class UserImportTest(unittest.TestCase):
+	def setUp(self):
+		self.database = sqlite3.connect(':memory:', factory=DatabaseWrapper)
+		with open(CHATTYBOI_PATH / 'schema.sql') as schema:
+			self.database.executescript(schema.read())
+
+	def tearDown(self):
+		self.database.close()
+
+	def nicknames(self):
+		return sorted(
+			nickname
+			for nicknames, in self.database.execute('SELECT nicknames FROM user_info')
+			for nickname in json.loads(nicknames)
+		)
+
+	def test_users_added_between_batches(self):
+		rows = [{'name': name} for name in ('alice', 'bob', 'carol', 'dave', 'live_1', 'erin')]
+		live = iter(['live_1', 'live_2'])
+
+		def add_live_user(status):
+			# Runs between batches, like a new chatter while the importer yields to the event loop
+			nickname = next(live, None)
+			if nickname is not None:
+				self.database.add_user([nickname])
+
+		importer = UserImporter(self.database, ['name'], batch_size=2)
+		status = asyncio.run(importer.run(rows, add_live_user))
+		self.assertEqual(status.users_added, 5)
+		self.assertEqual(status.rows_skipped, 1)
+		self.assertEqual(self.nicknames(), ['alice', 'bob', 'carol', 'dave', 'erin', 'live_1', 'live_2'])
+
+
+if __name__ == '__main__':
+	unittest.main()